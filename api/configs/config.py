@@ -40,6 +40,86 @@ class Settings(BaseSettings):
 
     ADMIN_MAX_FILE_SIZE = 2048 * 1024 * 1024 # 2GB
     ADMIN_MAX_TOTAL_UPLOAD_SIZE = 10240 * 1024 * 1024 # 10GB
+    UPLOAD_ENVELOPE_OVERHEAD = 1 * 1024 * 1024 # 1MB multipart boundaries/headers
+    UPLOAD_CONCURRENCY: int = 4 # تعداد آپلود همزمان فایل‌ها در آپلود چندتایی
+    UPLOAD_PARALLELISM: int = 4 # تعداد بخش‌های همزمان در آپلود چندبخشی یک فایل
+    UPLOAD_TARGET_PART_COUNT: int = 64 # تعداد تقریبی بخش‌ها برای انتخاب اندازه‌ی بخش
+    UPLOAD_MIN_PART_SIZE = 16 * 1024 * 1024 # 16MB
+    UPLOAD_MAX_PART_SIZE = 256 * 1024 * 1024 # 256MB
+
+    MULTIPART_MAX_FILE_SIZE = 5120 * 1024 * 1024 # 5GB
+    MULTIPART_MIN_PART_SIZE = 5 * 1024 * 1024 # 5MB (حداقل S3 به‌جز بخش آخر)
+    MULTIPART_MAX_PART_SIZE = 64 * 1024 * 1024 # 64MB
+    MULTIPART_DEFAULT_PART_SIZE = 8 * 1024 * 1024 # 8MB
+    MULTIPART_PART_UPLOAD_TIMEOUT: int = 300 # حداکثر زمان استریم هر بخش به MinIO (ثانیه)
+    STREAM_UPLOAD_PART_SIZE = 8 * 1024 * 1024 # 8MB بافر هر بخش در آپلود استریمی
+
+    PRESIGNED_UPLOAD_MAX_FILE_SIZE = 2048 * 1024 * 1024 # 2GB
+    PRESIGNED_UPLOAD_EXPIRY: int = 3600 # ثانیه
+
+    IDEMPOTENCY_KEY_TTL: int = 24 * 3600 # ثانیه
+    IDEMPOTENCY_PROCESSING_TTL: int = 3600 # پس از این مدت درخواست نیمه‌کاره رها شده فرض می‌شود
+    IDEMPOTENCY_WAIT_TIMEOUT: int = 60 # حداکثر انتظار برای درخواست تکراری در حال اجرا (ثانیه)
+
+    STORAGE_IO_WORKERS: int = 32 # تعداد thread های I/O برای MinIO در روت‌های async
+
+    # اندازه‌های استاندارد تصاویر (عرض به پیکسل) که پس از آپلود در پس‌زمینه ساخته می‌شوند
+    IMAGE_DERIVATIVE_SIZES: dict = {"thumbnail": 160, "card": 480, "full": 1280}
+
+    # موتور پردازش تصویر روی process pool
+    IMAGE_WORKERS: int = os.cpu_count() or 2 # تعداد پروسس‌های پردازش تصویر
+    IMAGE_QUEUE_SIZE: int = 64 # حداکثر کارهای در صف؛ بیش از این 503 برگردانده می‌شود
+    IMAGE_JOB_TIMEOUT: int = 30 # حداکثر زمان هر کار پردازش تصویر (ثانیه)
+    IMAGE_MAX_PIXELS: int = 50_000_000 # سقف تعداد پیکسل تصویر ورودی/خروجی (محافظت در برابر decompression bomb)
+
+    # حالت دانلود public-url: proxy (عبور بایت‌ها از API) یا redirect (302 به لینک موقت MinIO)
+    DEFAULT_DOWNLOAD_MODE: str = "proxy"
+    BUCKET_DOWNLOAD_MODES: dict = {}
+    REDIRECT_URL_EXPIRY: int = 300 # اعتبار لینک موقت در حالت redirect (ثانیه)
+
+    # کش لینک‌های موقت؛ لینک تا وقتی حداقل این نسبت از عمرش باقی مانده دوباره استفاده می‌شود
+    PRESIGNED_CACHE_MAX_ENTRIES: int = 10000
+    PRESIGNED_CACHE_MIN_REMAINING: float = 0.5
+
+    # ساخت استریمی ZIP؛ حداکثر حافظه تقریباً ZIP_PREFETCH_OBJECTS * ZIP_PREFETCH_CHUNKS * ZIP_CHUNK_SIZE است
+    ZIP_PREFETCH_OBJECTS: int = 4 # تعداد آبجکت‌هایی که جلوتر از عضو در حال نوشتن دریافت می‌شوند
+    ZIP_PREFETCH_CHUNKS: int = 4 # ظرفیت صف هر آبجکت (تعداد چانک)
+    ZIP_CHUNK_SIZE = 1 * 1024 * 1024 # 1MB
+
+    BASE64_MAX_SIZE = 20 * 1024 * 1024 # 20MB سقف فایل در دانلود Base64
+
+    # کش حافظه‌ی آبجکت‌های کوچک پرتکرار (لوگو، آیکون و ...)
+    HOT_CACHE_MAX_BYTES = 256 * 1024 * 1024 # 256MB
+    HOT_CACHE_MAX_OBJECT_SIZE = 512 * 1024 # 512KB
+    HOT_CACHE_TTL: int = 60 # اعتبار آبجکت‌های بدون version_id در کش (ثانیه)
+
+    # کش دیسکی چانک‌های فایل‌های بزرگ (ویدیو و صوت)
+    CHUNK_CACHE_DIR: str = os.getenv("CHUNK_CACHE_DIR", "/tmp/file-api/chunks")
+    CHUNK_CACHE_MAX_BYTES = 20 * 1024 * 1024 * 1024 # 20GB
+    CHUNK_CACHE_CHUNK_SIZE = 8 * 1024 * 1024 # 8MB
+    CHUNK_CACHE_MIN_OBJECT_SIZE = 8 * 1024 * 1024 # آبجکت‌های کوچک‌تر مستقیماً از MinIO خوانده می‌شوند
+
+    BATCH_METADATA_MAX_IDS: int = 200 # حداکثر شناسه در هر درخواست متادیتای دسته‌ای
+    BATCH_PRESIGN_MAX_IDS: int = 200 # حداکثر شناسه در هر درخواست تولید لینک دسته‌ای
+    RESPONSIVE_MAX_VARIANTS: int = 24 # حداکثر تعداد (عرض × فرمت) در هر درخواست تصویر واکنش‌گرا
+
+    # ادغام درخواست‌های یکسان همزمان (single-flight)
+    SINGLE_FLIGHT_MAX_KEYS: int = 1024 # حداکثر کلیدهای در حال اجرا در هر گروه
+    SINGLE_FLIGHT_TIMEOUT: int = 30 # حداکثر انتظار درخواست‌های دنباله‌رو (ثانیه)
+    SHARED_STREAM_MAX_BYTES = 256 * 1024 * 1024 # 256MB، سقف بافر مشترک دانلودهای همزمان
+
+    # کش دیسکی تصاویر تغییر اندازه داده‌شده (LRU بر اساس حجم کل)
+    VARIANT_CACHE_DIR: str = os.getenv("VARIANT_CACHE_DIR", "/tmp/file-api/variants")
+    VARIANT_CACHE_MAX_BYTES = 2048 * 1024 * 1024 # 2GB
+
+    # سیاست کش HTTP برای دانلودها؛ باکت‌هایی که در BUCKET_CACHE_POLICIES نیستند از مقدار پیش‌فرض استفاده می‌کنند
+    DEFAULT_CACHE_CONTROL: str = "public, max-age=300, must-revalidate"
+    IMMUTABLE_CACHE_CONTROL: str = "public, max-age=31536000, immutable" # برای لینک‌های دارای version_id
+    BUCKET_CACHE_POLICIES: dict = {
+        "cdn": "public, max-age=86400",
+        "images": "public, max-age=86400",
+        "financial": "private, no-cache",
+    }
 
     class Config:
         env_file = ".env"  # مشخص‌کردن نام فایل env
@@ -1,4 +1,4 @@
 # api/dbs/__init__.py
 
-from .database import engine, SessionLocal, Base, minio_client, get_db
+from .database import engine, SessionLocal, Base, minio_client, create_minio_client, get_db
 
@@ -21,10 +21,13 @@ def get_db():
     finally:
         db.close()
 
+def create_minio_client() -> Minio:
+    return Minio(
+        endpoint=settings.MINIO_URL.replace("http://", "").replace("https://", ""),
+        access_key=settings.MINIO_ACCESS_KEY,
+        secret_key=settings.MINIO_SECRET_KEY,
+        secure=settings.MINIO_URL.startswith("https://")
+    )
+
 # Initialize MinIO client
-minio_client = Minio(
-    endpoint=settings.MINIO_URL.replace("http://", "").replace("https://", ""),
-    access_key=settings.MINIO_ACCESS_KEY,
-    secret_key=settings.MINIO_SECRET_KEY,
-    secure=settings.MINIO_URL.startswith("https://")
-)
\ No newline at end of file
+minio_client = create_minio_client()
\ No newline at end of file
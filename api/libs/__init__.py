@@ -2,5 +2,5 @@
 
 from .apikey_manager import validate_api_key_dependency, validate_api_key, add_api_key, initialize_db, DB_NAME
 from .logging_config import setup_logging, logger
-from .metrics import REQUEST_COUNT, REQUEST_LATENCY, metrics_app
+from .metrics import REQUEST_COUNT, REQUEST_LATENCY, UPLOAD_BYTES, UPLOAD_THROUGHPUT, CACHE_REQUESTS, CACHE_BYTES, COALESCED_REQUESTS, metrics_app
 
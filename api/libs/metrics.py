@@ -1,6 +1,17 @@
-from prometheus_client import Counter, Summary, make_asgi_app
+from prometheus_client import Counter, Gauge, Summary, Histogram, make_asgi_app
 
 REQUEST_COUNT = Counter("request_count", "Total number of requests", ["method", "endpoint", "status"])
 REQUEST_LATENCY = Summary("request_latency_seconds", "Request latency in seconds", ["endpoint"])
 
+UPLOAD_BYTES = Counter("upload_bytes_total", "Total bytes uploaded to MinIO", ["bucket"])
+UPLOAD_THROUGHPUT = Histogram(
+    "upload_throughput_bytes_per_second",
+    "Throughput of single object uploads to MinIO",
+    buckets=[mb * 1024 * 1024 for mb in (1, 5, 10, 25, 50, 100, 250, 500, 1000)]
+)
+
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by result", ["cache", "result"])
+CACHE_BYTES = Gauge("cache_bytes", "Bytes currently held by a cache", ["cache"])
+COALESCED_REQUESTS = Counter("coalesced_requests_total", "Requests that joined an identical in-flight request", ["flight"])
+
 metrics_app = make_asgi_app()
@@ -1,10 +1,15 @@
 # app/main.py
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
 from routes.file_routes import file_router
-from utils import check_minio_connection, check_database_connection
-from libs import logger
+from utils import check_minio_connection, check_database_connection, upload_size_limit, validate_content_length, image_transformer
+from libs import logger, metrics_app
 from dbs import Base, engine
 from configs import settings
+from services import scoped_idempotency_key, RequestFingerprint, claim_idempotency_key, get_idempotency_key, complete_idempotency_key, release_idempotency_key
+import asyncio
+import time
 from fastapi.middleware.cors import CORSMiddleware
 
 # بررسی اتصال‌ها قبل از شروع برنامه
@@ -30,7 +35,87 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    # رد درخواست‌های بزرگ قبل از خواندن بدنه
+    limit = upload_size_limit(request.url.path)
+    if limit is not None:
+        try:
+            validate_content_length(request.headers.get("content-length"), limit)
+        except HTTPException as e:
+            return JSONResponse(status_code=e.status_code, content={"detail": e.detail})
+    return await call_next(request)
+
+def replay_idempotent_response(record):
+    return Response(
+        content=record.response_body,
+        status_code=record.status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"}
+    )
+
+def request_fingerprint(request: Request) -> RequestFingerprint:
+    return RequestFingerprint(request.method, request.url.path, request.url.query, request.headers.get("content-type"))
+
+@app.middleware("http")
+async def idempotent_uploads(request: Request, call_next):
+    # درخواست‌های تکراری آپلود با هدر Idempotency-Key پاسخ قبلی همان درخواست‌دهنده را دریافت می‌کنند
+    key = request.headers.get("idempotency-key")
+    if not key or request.method != "POST" or not request.url.path.startswith("/files/upload/"):
+        return await call_next(request)
+    if len(key) > 255:
+        return JSONResponse(status_code=400, content={"detail": "Idempotency-Key is too long"})
+
+    key = scoped_idempotency_key(key, request.headers.get("x-api-key"), request.query_params.get("user_id"))
+    fingerprint = request_fingerprint(request)
+    record = await run_in_threadpool(claim_idempotency_key, key, request.url.path)
+    if record is None:
+        # بدنه در حین خوانده شدن توسط route هش می‌شود
+        receive = request.receive
+
+        async def fingerprinting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                fingerprint.update(message.get("body", b""), message.get("more_body", False))
+            return message
+
+        request._receive = fingerprinting_receive
+        try:
+            response = await call_next(request)
+        except Exception:
+            await run_in_threadpool(release_idempotency_key, key)
+            raise
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        # اگر route کل بدنه را نخوانده باشد اثرانگشت ناقص است و پاسخ قابل تکرار ذخیره نمی‌شود
+        if response.status_code >= 500 or not fingerprint.complete:
+            await run_in_threadpool(release_idempotency_key, key)
+        else:
+            await run_in_threadpool(complete_idempotency_key, key, response.status_code, body.decode("utf-8"), fingerprint.hexdigest())
+        return Response(content=body, status_code=response.status_code, headers=dict(response.headers), media_type=response.media_type)
+
+    if record.request_path != request.url.path:
+        return JSONResponse(status_code=422, content={"detail": "Idempotency-Key was already used for a different request"})
+
+    async for chunk in request.stream():
+        fingerprint.update(chunk)
+    fingerprint.update(b"", more_body=False)
+
+    # درخواست اصلی هنوز در حال اجراست؛ منتظر نتیجه‌ی آن می‌مانیم
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+    while record and record.status != "completed" and time.monotonic() < deadline:
+        await asyncio.sleep(0.5)
+        record = await run_in_threadpool(get_idempotency_key, key)
+
+    if record and record.status == "completed":
+        if record.fingerprint != fingerprint.hexdigest():
+            return JSONResponse(status_code=422, content={"detail": "Idempotency-Key was already used for a request with a different body"})
+        return replay_idempotent_response(record)
+    if record is None:
+        return JSONResponse(status_code=409, content={"detail": "The original request with this Idempotency-Key failed, retry it"})
+    return JSONResponse(status_code=409, content={"detail": "A request with this Idempotency-Key is still in progress"})
+
 app.include_router(file_router)
+app.mount("/metrics", metrics_app)
 
 @app.on_event("startup")
 async def startup_event():
@@ -52,3 +137,8 @@ async def startup_event():
     logger.info("Database tables created successfully.")
 
     logger.info("Application started successfully.")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # بستن پروسس‌های پردازش تصویر
+    image_transformer.shutdown()
@@ -1,4 +1,4 @@
 # api/models/__init__.py
 
-from .file_model import FileModel, uuid4, FileRequestLog
+from .file_model import FileModel, uuid4, FileRequestLog, MultipartUpload, MultipartUploadPart, FileBlob, FileBlobRef, FileDerivative, IdempotencyKey
 
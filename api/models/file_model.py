@@ -1,6 +1,6 @@
 # api/models/file_model.py
 
-from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey
+from sqlalchemy import Column, String, Integer, BigInteger, Float, DateTime, ForeignKey, UniqueConstraint, Text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from dbs import Base
@@ -38,3 +38,82 @@ class FileModel(Base):
 
     # ارتباط با جدول درخواست‌ها
     requests = relationship("FileRequestLog", back_populates="file", cascade="all, delete-orphan")
+    # آبجکت مشترک (در صورت حذف تکرار محتوا)
+    blob = relationship("FileBlob", secondary="file_blob_refs", uselist=False, viewonly=True)
+
+
+class MultipartUpload(Base):
+    __tablename__ = "multipart_uploads"
+
+    file_id = Column(UUID(as_uuid=True), ForeignKey("files.id", ondelete="CASCADE"), primary_key=True)
+    upload_id = Column(String, nullable=False)  # شناسه آپلود چندبخشی در MinIO
+    object_name = Column(String, nullable=False)  # کلید کامل آبجکت در باکت
+    total_size = Column(BigInteger, nullable=True)  # حجم اعلام‌شده توسط کلاینت
+    part_size = Column(BigInteger, nullable=False)
+    status = Column(String, nullable=False, default="in_progress")  # in_progress / completed
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    file = relationship("FileModel")
+    parts = relationship("MultipartUploadPart", back_populates="upload", cascade="all, delete-orphan", order_by="MultipartUploadPart.part_number")
+
+class MultipartUploadPart(Base):
+    __tablename__ = "multipart_upload_parts"
+    __table_args__ = (UniqueConstraint("file_id", "part_number"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    file_id = Column(UUID(as_uuid=True), ForeignKey("multipart_uploads.file_id", ondelete="CASCADE"), nullable=False)
+    part_number = Column(Integer, nullable=False)
+    etag = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    upload = relationship("MultipartUpload", back_populates="parts")
+
+class FileBlob(Base):
+    __tablename__ = "file_blobs"
+    __table_args__ = (UniqueConstraint("bucket_name", "sha256"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), nullable=False, index=True)  # هش محتوای فایل
+    bucket_name = Column(String, nullable=False)
+    object_name = Column(String, nullable=False)  # کلید آبجکت فیزیکی (کلید یکی از فایل‌های ارجاع‌دهنده)
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=1)  # تعداد فایل‌های ارجاع‌دهنده
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    refs = relationship("FileBlobRef", back_populates="blob")
+
+class FileBlobRef(Base):
+    __tablename__ = "file_blob_refs"
+
+    file_id = Column(UUID(as_uuid=True), ForeignKey("files.id", ondelete="CASCADE"), primary_key=True)
+    blob_id = Column(Integer, ForeignKey("file_blobs.id"), nullable=False, index=True)
+
+    blob = relationship("FileBlob", back_populates="refs")
+
+class FileDerivative(Base):
+    __tablename__ = "file_derivatives"
+    __table_args__ = (UniqueConstraint("file_id", "name"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    file_id = Column(UUID(as_uuid=True), ForeignKey("files.id", ondelete="CASCADE"), nullable=False, index=True)
+    name = Column(String, nullable=False)  # thumbnail / card / full
+    width = Column(Integer, nullable=False)
+    height = Column(Integer, nullable=False)
+    object_name = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String, nullable=False)
+    source_version_id = Column(String, nullable=True)  # نسخه فایل اصلی که از آن ساخته شده
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_requests"
+
+    key = Column(String(64), primary_key=True)  # هش هدر Idempotency-Key همراه با کلید API و user_id درخواست‌دهنده
+    request_path = Column(String, nullable=False)
+    fingerprint = Column(String(64), nullable=True)  # هش متد، مسیر، query و بدنه‌ی درخواست اصلی
+    status = Column(String, nullable=False, default="processing")  # processing / completed
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,45 +1,105 @@
 # api/routes/file_routes.py
 
-from fastapi import File, APIRouter, UploadFile, HTTPException, Depends, Request, Form, Response
+from fastapi import File, APIRouter, UploadFile, HTTPException, Depends, Request, Form, Response, BackgroundTasks, Query
 from sqlalchemy.orm import Session
 from dbs import get_db, minio_client
-from schemas import FileUploadResponse, FilesUploadResponse
+from schemas import FileUploadResponse, FilesUploadResponse, FilesMetadataResponse
 from typing import List, Optional
 from utils import (
     upload_file_to_minio,
+    upload_files_to_minio,
+    create_multipart_upload,
+    complete_multipart_upload,
+    abort_multipart_upload,
+    generate_presigned_post_policy,
     list_buckets,
-    list_objects_in_bucket,
     human_readable_size,
     get,
     setex,
+    setex_many,
     validate_total_size,
     validate_file_size,
     validate_file_type,
+    SizeLimitedStream,
     folder_path_validat,
     convert_folder_path_to_validate_path,
     does_path_exist,
-    stream_buffered,
-    stream_minio_object
+    async_storage,
+    run_storage_io,
+    StreamedUpload,
+    ranged_object_response,
+    object_validators,
+    cache_control_for,
+    is_not_modified,
+    variant_etag,
+    variant_cache,
+    render_variant,
+    render_variant_set,
+    image_media_type,
+    RASTER_IMAGE_EXTENSIONS,
+    image_transformer,
+    presigned_url_cache,
+    ZipMember,
+    stream_zip,
+    stream_base64_json,
+    iter_bytes,
+    BASE64_CHUNK_SIZE,
+    hot_object_cache,
+    fetch_hot_object,
+    chunk_cache,
+    shared_object_stream
+)
+from models import uuid4, FileModel, FileRequestLog, MultipartUpload, MultipartUploadPart, FileBlobRef
+from services import (
+    log_request,
+    get_files,
+    object_name_of,
+    resolve_object,
+    hash_streams,
+    find_blobs,
+    link_blob,
+    register_blob,
+    relocate_blob,
+    release_blob,
+    is_derivable_image,
+    generate_derivatives,
+    find_derivative,
+    clear_derivatives
 )
-from models import uuid4, FileModel, FileRequestLog
-from services import log_request, get_files
 from datetime import timedelta
-from fastapi.responses import StreamingResponse
+from functools import partial
+from fastapi.responses import StreamingResponse, RedirectResponse
+from starlette.concurrency import run_in_threadpool
 from minio.error import S3Error
 from minio.versioningconfig import VersioningConfig
 from libs import logger
-import base64
 from uuid import UUID
-from configs import settings, ignoree_list_delete_object_bucket, ignoree_list_delete_bucket
+from configs import settings, allowed_extensions, ignoree_list_delete_object_bucket, ignoree_list_delete_bucket
 import json
 from mimetypes import guess_type
-from PIL import Image
 from io import BytesIO
 from urllib.parse import quote
-from zipfile import ZipFile
 
 file_router = APIRouter(prefix="/files")
 
+def file_upload_response(file_record: FileModel) -> dict:
+    """
+    Build the FileUploadResponse payload of a stored file.
+    """
+    return {
+        "file_id": str(file_record.id),
+        "name": file_record.file_name,
+        "file_key": file_record.file_key,
+        "folder_path": file_record.folder_path,
+        "file_type": file_record.file_type,
+        "extension": file_record.file_extension,
+        "size": file_record.file_size,
+        "version_id": file_record.version_id,
+        "human_readable_size": human_readable_size(file_record.file_size),
+        "last_modified": file_record.created_at.isoformat(),
+        "etag": str(file_record.id),
+        "public_url": file_record.public_url
+    }
 
 
 @file_router.post("/create-path/{bucket_name}/{folder_path:path}", tags=["path"])
@@ -105,6 +165,7 @@ def delete_path(bucket_name: str, folder_path: str):
 def upload_multiple_files(
     bucket_name: str,
     folder_path: str,
+    background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...),
     user_id: str = "00000000-0000-4b94-8e27-44833c2b940f",
     db: Session = Depends(get_db),
@@ -130,100 +191,589 @@ def upload_multiple_files(
 
     uploaded_files = []
     skipped_files = []
+    pending = []
 
+    # Validate every file and prepare its DB row (ids are generated client-side)
     for upload in files:
+        filename = upload.filename
         try:
             validate_file_type(upload)
-            filename = upload.filename
-            # Determine extension and type
-            extension = filename.rsplit('.', 1)[-1] if '.' in filename else None
-            if not extension:
-                logger.warning(f"File extension missing: {filename}")
-
-            mime_type = upload.content_type
-            # Create DB record
-            new_file = FileModel(
-                file_name=filename,
-                file_key="",
-                file_extension=extension,
-                bucket_name=bucket_name,
-                file_type=mime_type,
-                file_size=0,
-                folder_path=folder_path,
-                public_url="",
-                user_id=user_id
-            )
-            db.add(new_file)
-            db.commit()
-            db.refresh(new_file)
-
-            # Set object key and upload
-            file_key = f"{new_file.id}.{extension}" if extension else str(new_file.id)
-            # Upload to MinIO
-            result = upload_file_to_minio(bucket_name, folder_path, file_key, upload.file)
-            version_id = getattr(result, "version_id", None)
-
-            # Calculate file size
-            upload.file.seek(0, 2)
-            size = upload.file.tell()
-            if size <= 0:
-                raise HTTPException(status_code=400, detail="Invalid file size")
-            upload.file.seek(0)
-
-            # Construct public URL
-            base = request.base_url if request else ""
-            public_url = f"https://{settings.BASE_DOMAIN}/files/download/public-url/{bucket_name}/{new_file.id}?folder_path={folder_path}"
-            if version_id:
-                public_url += f"&version_id={version_id}"
-
-            # Update DB record
-            new_file.file_key = file_key
-            new_file.file_size = size
-            new_file.public_url = public_url
-            new_file.version_id = version_id
-            db.commit()
-            
-            public_url = f"https://{settings.BASE_DOMAIN}/files/download/public-url"
-
-            if new_file.id: 
-                public_url += f"/{new_file.id}"
-
-            uploaded_files.append({
-                "file_id": str(new_file.id),
-                "name": new_file.file_name,
-                "file_key": new_file.file_key,
-                "folder_path": new_file.folder_path,
-                "file_type": new_file.file_type,
-                "extension": new_file.file_extension,
-                "size": new_file.file_size,
-                "version_id": new_file.version_id,
-                "human_readable_size": human_readable_size(new_file.file_size),
-                "last_modified": new_file.created_at.isoformat(),
-                "etag": str(new_file.id) if new_file.id is not None else None,
-                "public_url": public_url
-            })
+            validate_file_size(upload)
         except HTTPException as e:
-            # Propagate HTTP errors
             skipped_files.append({
-                "filename": upload.filename,
+                "filename": filename,
                 "reason": e.detail
             })
-            # raise
-        except Exception as e:
-            logger.error(f"Failed to upload {filename}: {e}")
             continue
-            
+
+        extension = filename.rsplit('.', 1)[-1] if '.' in filename else None
+        if not extension:
+            logger.warning(f"File extension missing: {filename}")
+
+        file_id = uuid4()
+        new_file = FileModel(
+            id=file_id,
+            file_name=filename,
+            file_key=f"{file_id}.{extension}" if extension else str(file_id),
+            file_extension=extension,
+            bucket_name=bucket_name,
+            file_type=upload.content_type,
+            file_size=0,
+            folder_path=folder_path,
+            public_url="",
+            user_id=user_id
+        )
+        stream = SizeLimitedStream(upload.file, settings.MAX_FILE_SIZE, filename)
+        pending.append((upload, new_file, stream))
+
+    # Hash all files in parallel, like the uploads below
+    hashes = hash_streams([upload.file for upload, _, _ in pending])
+    pending = [item + (content_hash,) for item, (content_hash, _) in zip(pending, hashes)]
+
+    # Insert all rows in one batched statement
+    db.add_all([new_file for _, new_file, _, _ in pending])
+    db.flush()
+
+    # Only content not already stored in the bucket (or earlier in this batch) is uploaded
+    blobs = find_blobs(db, bucket_name, [content_hash for _, _, _, content_hash in pending])
+    to_upload = []
+    seen_hashes = set()
+    for item in pending:
+        content_hash = item[3]
+        if content_hash not in blobs and content_hash not in seen_hashes:
+            to_upload.append(item)
+        seen_hashes.add(content_hash)
+
+    # Upload to MinIO in parallel, counting bytes as they stream
+    results = upload_files_to_minio(
+        bucket_name,
+        folder_path,
+        [(new_file.file_key, stream) for _, new_file, stream, _ in to_upload]
+    )
+    upload_results = {id(item): result for item, result in zip(to_upload, results)}
+
+    for item in pending:
+        upload, new_file, stream, content_hash = item
+        if id(item) in upload_results:
+            result = upload_results[id(item)]
+            if isinstance(result, HTTPException):
+                skipped_files.append({
+                    "filename": upload.filename,
+                    "reason": result.detail
+                })
+                db.delete(new_file)
+                continue
+            if isinstance(result, Exception):
+                logger.error(f"Failed to upload {upload.filename}: {result}")
+                db.delete(new_file)
+                continue
+
+            size = stream.bytes_read
+            if size <= 0:
+                skipped_files.append({
+                    "filename": upload.filename,
+                    "reason": "Invalid file size"
+                })
+                db.delete(new_file)
+                continue
+
+            version_id = getattr(result, "version_id", None)
+            blob = register_blob(db, new_file, content_hash, size)
+            if blob:
+                blobs[content_hash] = blob
+            else:
+                blobs.update(find_blobs(db, bucket_name, [content_hash]))
+        else:
+            blob = blobs.get(content_hash)
+            if not blob:
+                skipped_files.append({
+                    "filename": upload.filename,
+                    "reason": "Upload of identical content in this batch failed"
+                })
+                db.delete(new_file)
+                continue
+            link_blob(db, new_file, blob)
+            size = blob.size
+            version_id = None
+
+        public_url = f"https://{settings.BASE_DOMAIN}/files/download/public-url/{bucket_name}/{new_file.id}?folder_path={folder_path}"
+        if version_id:
+            public_url += f"&version_id={version_id}"
+
+        new_file.file_size = size
+        new_file.public_url = public_url
+        new_file.version_id = version_id
+
+        uploaded_files.append({
+            "file_id": str(new_file.id),
+            "name": new_file.file_name,
+            "file_key": new_file.file_key,
+            "folder_path": new_file.folder_path,
+            "file_type": new_file.file_type,
+            "extension": new_file.file_extension,
+            "size": new_file.file_size,
+            "version_id": new_file.version_id,
+            "human_readable_size": human_readable_size(new_file.file_size),
+            "last_modified": new_file.created_at.isoformat(),
+            "etag": str(new_file.id),
+            "public_url": f"https://{settings.BASE_DOMAIN}/files/download/public-url/{new_file.id}"
+        })
+
+    # Finalize all rows in one commit
+    db.commit()
+
+    # Render standard image sizes in the background
+    for _, new_file, _, _ in pending:
+        if new_file.file_size and is_derivable_image(new_file):
+            background_tasks.add_task(generate_derivatives, new_file.id)
+
     return FilesUploadResponse(
             message="Files uploaded successfully",
             uploaded_files=uploaded_files,
             skipped_files=skipped_files  # ← لیست خالی اگر چیزی رد نشده
         )
 
+@file_router.post("/upload/multipart/initiate/{bucket_name}/{folder_path:path}", tags=["upload"], summary="Start a resumable multipart upload")
+def initiate_multipart_upload(
+    bucket_name: str,
+    folder_path: str,
+    file_name: str,
+    file_size: int = None,
+    content_type: str = None,
+    part_size: int = None,
+    user_id: str = "00000000-0000-4b94-8e27-44833c2b940f",
+    db: Session = Depends(get_db)
+):
+    """
+    Create the file record and a MinIO multipart upload; parts are then sent one by one.
+    """
+    file_extension = file_name.rsplit('.', 1)[-1].lower() if '.' in file_name else None
+    if file_extension not in allowed_extensions:
+        raise HTTPException(status_code=400, detail=f"File type '.{file_extension}' of file '{file_name}' is not allowed")
+
+    if file_size is not None and file_size > settings.MULTIPART_MAX_FILE_SIZE:
+        raise HTTPException(status_code=413, detail=f"File '{file_name}' exceeds the maximum allowed size of {settings.MULTIPART_MAX_FILE_SIZE // (1024 * 1024)} MB")
+
+    part_size = part_size or settings.MULTIPART_DEFAULT_PART_SIZE
+    if not settings.MULTIPART_MIN_PART_SIZE <= part_size <= settings.MULTIPART_MAX_PART_SIZE:
+        raise HTTPException(status_code=400, detail=f"Part size must be between {settings.MULTIPART_MIN_PART_SIZE} and {settings.MULTIPART_MAX_PART_SIZE} bytes")
+
+    folder_path = convert_folder_path_to_validate_path(folder_path)
+    if not folder_path_validat(folder_path) and folder_path != "":
+        raise HTTPException(status_code=404, detail=f"folder path is not valid")
+
+    if not minio_client.bucket_exists(bucket_name):
+        raise HTTPException(status_code=404, detail=f"Bucket '{bucket_name}' does not exist")
+
+    if not does_path_exist(bucket_name, folder_path) and folder_path != "":
+        raise HTTPException(status_code=404, detail=f"Bucket '{bucket_name}' have not exist this path '{folder_path}'")
+
+    content_type = content_type or guess_type(file_name)[0] or "application/octet-stream"
+    file_id = uuid4()
+    file_key = f"{file_id}.{file_extension}"
+    object_name = f"{folder_path}/{file_key}" if folder_path else file_key
+
+    try:
+        upload_id = create_multipart_upload(bucket_name, object_name, content_type)
+    except Exception as e:
+        logger.error(f"Failed to initiate multipart upload: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    new_file = FileModel(
+        id=file_id,
+        file_name=file_name,
+        file_key=file_key,
+        file_extension=file_extension,
+        bucket_name=bucket_name,
+        file_type=content_type,
+        file_size=0,
+        folder_path=folder_path,
+        public_url="",
+        user_id=user_id
+    )
+    db.add(new_file)
+    db.add(MultipartUpload(
+        file_id=file_id,
+        upload_id=upload_id,
+        object_name=object_name,
+        total_size=file_size,
+        part_size=part_size
+    ))
+    db.commit()
+
+    return {
+        "message": "Multipart upload initiated",
+        "file_id": str(file_id),
+        "file_key": file_key,
+        "upload_id": upload_id,
+        "part_size": part_size,
+        "part_count": -(-file_size // part_size) if file_size else None
+    }
+
+def get_multipart_upload(db: Session, file_id: str) -> MultipartUpload:
+    upload = db.query(MultipartUpload).filter(MultipartUpload.file_id == file_id).first()
+    if not upload:
+        raise HTTPException(status_code=404, detail="Multipart upload not found")
+    return upload
+
+def prepare_multipart_part(db: Session, file_id: UUID, part_number: int, length: int) -> tuple:
+    upload = get_multipart_upload(db, file_id)
+    if upload.status != "in_progress":
+        raise HTTPException(status_code=409, detail=f"Multipart upload is {upload.status}")
+    if length > upload.part_size:
+        raise HTTPException(status_code=413, detail=f"Part exceeds the part size of {upload.part_size} bytes")
+
+    # به‌جز بخش آخر، هر بخش باید دقیقاً part_size باشد؛ وگرنه MinIO هنگام complete خطای EntityTooSmall می‌دهد
+    short_part = f"Only the last part may be smaller than the part size of {upload.part_size} bytes"
+    if upload.total_size:
+        last_part_number = -(-upload.total_size // upload.part_size)
+        if part_number > last_part_number:
+            raise HTTPException(status_code=400, detail=f"Part number exceeds the part count of {last_part_number}")
+        if part_number < last_part_number and length < upload.part_size:
+            raise HTTPException(status_code=400, detail=short_part)
+    else:
+        if length < upload.part_size and any(part.part_number > part_number for part in upload.parts):
+            raise HTTPException(status_code=400, detail=short_part)
+        if any(part.part_number < part_number and part.size < upload.part_size for part in upload.parts):
+            raise HTTPException(status_code=400, detail=short_part)
+
+    uploaded_size = sum(part.size for part in upload.parts if part.part_number != part_number)
+    if uploaded_size + length > (upload.total_size or settings.MULTIPART_MAX_FILE_SIZE):
+        raise HTTPException(status_code=413, detail="Uploaded parts exceed the declared file size")
+    return upload.file.bucket_name, upload.object_name, upload.upload_id
+
+def record_multipart_part(db: Session, file_id: UUID, part_number: int, etag: str, size: int):
+    db.query(MultipartUploadPart).filter(
+        MultipartUploadPart.file_id == file_id,
+        MultipartUploadPart.part_number == part_number
+    ).delete()
+    db.add(MultipartUploadPart(file_id=file_id, part_number=part_number, etag=etag, size=size))
+    db.commit()
+
+async def exact_length_stream(request: Request, length: int):
+    # بدنه همان‌طور که می‌رسد به MinIO فرستاده می‌شود؛ طول باید با Content-Length یکی باشد
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > length:
+            raise HTTPException(status_code=400, detail="Part body is longer than its Content-Length")
+        yield chunk
+    if received != length:
+        raise HTTPException(status_code=400, detail="Part body is shorter than its Content-Length")
+
+@file_router.put("/upload/multipart/{file_id}/parts/{part_number}", tags=["upload"], summary="Upload one part of a multipart upload")
+async def upload_multipart_part(file_id: UUID, part_number: int, request: Request, db: Session = Depends(get_db)):
+    """
+    Stream the raw request body to MinIO as part `part_number`; re-sending a part replaces it.
+    """
+    if not 1 <= part_number <= 10000:
+        raise HTTPException(status_code=400, detail="Part number must be between 1 and 10000")
+
+    content_length = request.headers.get("content-length")
+    if content_length is None or not content_length.isdigit():
+        raise HTTPException(status_code=411, detail="Content-Length is required")
+    length = int(content_length)
+    if length == 0:
+        raise HTTPException(status_code=400, detail="Empty part")
+
+    bucket_name, object_name, upload_id = await run_in_threadpool(prepare_multipart_part, db, file_id, part_number, length)
+
+    try:
+        etag = await async_storage.upload_part_stream(
+            bucket_name, object_name, upload_id, part_number, exact_length_stream(request, length), length
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to upload part {part_number} of {file_id}: {e}")
+        raise HTTPException(status_code=502, detail=str(e))
+
+    await run_in_threadpool(record_multipart_part, db, file_id, part_number, etag, length)
+
+    return {"file_id": str(file_id), "part_number": part_number, "etag": etag, "size": length}
+
+@file_router.get("/upload/multipart/{file_id}", tags=["upload"], summary="Get the parts already uploaded")
+def get_multipart_upload_status(file_id: UUID, db: Session = Depends(get_db)):
+    """
+    Return the uploaded parts so an interrupted client can resume from the last good one.
+    """
+    upload = get_multipart_upload(db, file_id)
+    uploaded_size = sum(part.size for part in upload.parts)
+    return {
+        "file_id": str(file_id),
+        "status": upload.status,
+        "part_size": upload.part_size,
+        "total_size": upload.total_size,
+        "uploaded_size": uploaded_size,
+        "parts": [
+            {"part_number": part.part_number, "etag": part.etag, "size": part.size}
+            for part in upload.parts
+        ]
+    }
+
+@file_router.post("/upload/multipart/{file_id}/complete", tags=["upload"], response_model=FileUploadResponse, summary="Complete a multipart upload")
+def complete_multipart(file_id: UUID, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """
+    Assemble the uploaded parts in MinIO and finalize the file record.
+    """
+    upload = get_multipart_upload(db, file_id)
+    if upload.status != "in_progress":
+        raise HTTPException(status_code=409, detail=f"Multipart upload is {upload.status}")
+    if not upload.parts:
+        raise HTTPException(status_code=400, detail="No parts uploaded")
+
+    part_numbers = [part.part_number for part in upload.parts]
+    if part_numbers != list(range(1, len(part_numbers) + 1)):
+        raise HTTPException(status_code=400, detail="Parts are not contiguous, upload the missing parts first")
+
+    file_size = sum(part.size for part in upload.parts)
+    if upload.total_size and file_size != upload.total_size:
+        raise HTTPException(status_code=400, detail=f"Uploaded {file_size} bytes, expected {upload.total_size}")
+
+    existing_file = upload.file
+    try:
+        result = complete_multipart_upload(
+            existing_file.bucket_name,
+            upload.object_name,
+            upload.upload_id,
+            [(part.part_number, part.etag) for part in upload.parts]
+        )
+    except Exception as e:
+        logger.error(f"Failed to complete multipart upload {file_id}: {e}")
+        raise HTTPException(status_code=502, detail=str(e))
+
+    version_id = getattr(result, "version_id", None)
+    public_url = f"https://{settings.BASE_DOMAIN}/files/download/public-url/{existing_file.id}"
+    if version_id:
+        public_url += f"?version_id={version_id}"
+
+    existing_file.file_size = file_size
+    existing_file.version_id = version_id
+    existing_file.public_url = public_url
+    upload.status = "completed"
+    db.query(MultipartUploadPart).filter(MultipartUploadPart.file_id == upload.file_id).delete()
+    db.commit()
+
+    if is_derivable_image(existing_file):
+        background_tasks.add_task(generate_derivatives, existing_file.id)
+
+    return file_upload_response(existing_file)
+
+@file_router.delete("/upload/multipart/{file_id}", tags=["upload"], summary="Abort a multipart upload")
+def abort_multipart(file_id: UUID, db: Session = Depends(get_db)):
+    """
+    Abort the MinIO multipart upload and remove the pending file record.
+    """
+    upload = get_multipart_upload(db, file_id)
+    if upload.status != "in_progress":
+        raise HTTPException(status_code=409, detail=f"Multipart upload is {upload.status}")
+
+    try:
+        abort_multipart_upload(upload.file.bucket_name, upload.object_name, upload.upload_id)
+    except Exception as e:
+        logger.warning(f"Failed to abort multipart upload {file_id}: {e}")
+
+    existing_file = upload.file
+    db.delete(upload)
+    db.delete(existing_file)
+    db.commit()
+
+    return {"message": "Multipart upload aborted"}
+
+# قبل از مسیر /upload/presigned/{bucket_name}/{folder_path:path} ثبت می‌شود تا آن مسیر این درخواست را نگیرد
+@file_router.post("/upload/presigned/{file_id:uuid}/complete", tags=["upload"], response_model=FileUploadResponse, summary="Confirm a direct upload to MinIO")
+def complete_presigned_upload(file_id: UUID, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """
+    Check the uploaded object with stat_object and fill in size, version and public URL.
+    """
+    existing_file = db.query(FileModel).filter(FileModel.id == file_id).first()
+    if not existing_file:
+        raise HTTPException(status_code=404, detail="File not found in database")
+
+    if existing_file.file_size > 0:
+        return file_upload_response(existing_file)
+
+    object_name = f"{existing_file.folder_path}/{existing_file.file_key}" if existing_file.folder_path else existing_file.file_key
+    try:
+        stat = minio_client.stat_object(existing_file.bucket_name, object_name)
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchObject"):
+            raise HTTPException(status_code=409, detail="File has not been uploaded yet")
+        logger.error(f"MinIO error: {e.code} - {e.message}")
+        raise HTTPException(status_code=502, detail=f"MinIO error: {e.message}")
+
+    if stat.size <= 0 or stat.size > settings.PRESIGNED_UPLOAD_MAX_FILE_SIZE:
+        minio_client.remove_object(existing_file.bucket_name, object_name)
+        raise HTTPException(status_code=400, detail="Invalid file size")
+
+    public_url = f"https://{settings.BASE_DOMAIN}/files/download/public-url/{existing_file.id}"
+    if stat.version_id:
+        public_url += f"?version_id={stat.version_id}"
+
+    existing_file.file_size = stat.size
+    existing_file.version_id = stat.version_id
+    existing_file.public_url = public_url
+    existing_file.file_type = stat.content_type or existing_file.file_type
+    db.commit()
+
+    if is_derivable_image(existing_file):
+        background_tasks.add_task(generate_derivatives, existing_file.id)
+
+    return file_upload_response(existing_file)
+
+@file_router.post("/upload/presigned/{bucket_name}/{folder_path:path}", tags=["upload"], summary="Get a presigned POST policy for a direct upload to MinIO")
+def create_presigned_upload(
+    bucket_name: str,
+    folder_path: str,
+    file_name: str,
+    file_size: int,
+    content_type: str = None,
+    expiry_seconds: int = None,
+    user_id: str = "00000000-0000-4b94-8e27-44833c2b940f",
+    db: Session = Depends(get_db)
+):
+    """
+    Create the file record and return a presigned POST policy that only accepts
+    this object key, content type and size; the client then uploads straight to MinIO
+    and calls the complete endpoint.
+    """
+    file_extension = file_name.rsplit('.', 1)[-1].lower() if '.' in file_name else None
+    if file_extension not in allowed_extensions:
+        raise HTTPException(status_code=400, detail=f"File type '.{file_extension}' of file '{file_name}' is not allowed")
+
+    if file_size <= 0:
+        raise HTTPException(status_code=400, detail="Invalid file size")
+    if file_size > settings.PRESIGNED_UPLOAD_MAX_FILE_SIZE:
+        raise HTTPException(status_code=413, detail=f"File '{file_name}' exceeds the maximum allowed size of {settings.PRESIGNED_UPLOAD_MAX_FILE_SIZE // (1024 * 1024)} MB")
+
+    folder_path = convert_folder_path_to_validate_path(folder_path)
+    if not folder_path_validat(folder_path) and folder_path != "":
+        raise HTTPException(status_code=404, detail=f"folder path is not valid")
+
+    if not minio_client.bucket_exists(bucket_name):
+        raise HTTPException(status_code=404, detail=f"Bucket '{bucket_name}' does not exist")
+
+    if not does_path_exist(bucket_name, folder_path) and folder_path != "":
+        raise HTTPException(status_code=404, detail=f"Bucket '{bucket_name}' have not exist this path '{folder_path}'")
+
+    content_type = content_type or guess_type(file_name)[0] or "application/octet-stream"
+    expiry_seconds = expiry_seconds or settings.PRESIGNED_UPLOAD_EXPIRY
+    file_id = uuid4()
+    file_key = f"{file_id}.{file_extension}"
+    object_name = f"{folder_path}/{file_key}" if folder_path else file_key
+
+    try:
+        form_data = generate_presigned_post_policy(bucket_name, object_name, content_type, file_size, expiry_seconds)
+    except Exception as e:
+        logger.error(f"Failed to generate presigned POST policy: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    new_file = FileModel(
+        id=file_id,
+        file_name=file_name,
+        file_key=file_key,
+        file_extension=file_extension,
+        bucket_name=bucket_name,
+        file_type=content_type,
+        file_size=0,
+        folder_path=folder_path,
+        public_url="",
+        user_id=user_id
+    )
+    db.add(new_file)
+    db.commit()
+
+    return {
+        "message": "Presigned upload policy generated successfully",
+        "file_id": str(file_id),
+        "file_key": file_key,
+        "upload_url": f"{settings.MINIO_URL}/{bucket_name}",
+        "method": "POST",
+        "fields": form_data,
+        "expires_in": expiry_seconds
+    }
+
+@file_router.post("/upload/stream/{bucket_name}/{folder_path:path}", tags=["upload"], response_model=FileUploadResponse, summary="Stream a file into MinIO without spooling it to disk")
+async def upload_file_streaming(
+    bucket_name: str,
+    folder_path: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    user_id: str = "00000000-0000-4b94-8e27-44833c2b940f",
+    db: Session = Depends(get_db)
+):
+    """
+    Parse the multipart body incrementally and pipe the file part into a MinIO
+    multipart upload as it arrives; the file is never written to local disk.
+    """
+    folder_path = convert_folder_path_to_validate_path(folder_path)
+    if not folder_path_validat(folder_path) and folder_path != "":
+        raise HTTPException(status_code=404, detail=f"folder path is not valid")
+
+    if not await async_storage.bucket_exists(bucket_name):
+        raise HTTPException(status_code=404, detail=f"Bucket '{bucket_name}' does not exist")
+
+    if not await async_storage.path_exists(bucket_name, folder_path) and folder_path != "":
+        raise HTTPException(status_code=404, detail=f"Bucket '{bucket_name}' have not exist this path '{folder_path}'")
+
+    file_id = uuid4()
+    upload = StreamedUpload(request.headers.get("content-type"), bucket_name, folder_path, str(file_id))
+    try:
+        async for chunk in request.stream():
+            await upload.feed(chunk)
+        result = await upload.finish()
+    except HTTPException:
+        await upload.abort()
+        raise
+    except Exception as e:
+        await upload.abort()
+        logger.error(f"Streaming upload failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Upload to MinIO failed: {str(e)}")
+
+    version_id = getattr(result, "version_id", None)
+    new_file = FileModel(
+        id=file_id,
+        file_name=upload.file_name,
+        file_key=upload.file_key,
+        file_extension=upload.extension,
+        bucket_name=bucket_name,
+        file_type=upload.content_type,
+        file_size=upload.size,
+        folder_path=folder_path,
+        public_url="",
+        user_id=user_id
+    )
+    db.add(new_file)
+    db.flush()
+
+    # محتوای تکراری: آبجکت تازه حذف و فایل به آبجکت مشترک ارجاع داده می‌شود
+    content_hash = upload.sha256.hexdigest()
+    blob = find_blobs(db, bucket_name, [content_hash]).get(content_hash)
+    if blob:
+        await run_storage_io(minio_client.remove_object, bucket_name, upload.object_name, version_id=version_id)
+        link_blob(db, new_file, blob)
+        version_id = None
+    else:
+        register_blob(db, new_file, content_hash, upload.size)
+
+    new_file.version_id = version_id
+    new_file.public_url = f"https://{settings.BASE_DOMAIN}/files/download/public-url/{file_id}"
+    if version_id:
+        new_file.public_url += f"?version_id={version_id}"
+    db.commit()
+
+    if is_derivable_image(new_file):
+        background_tasks.add_task(generate_derivatives, new_file.id)
+
+    logger.info(f"File streamed successfully: {upload.object_name}")
+    return file_upload_response(new_file)
+
 @file_router.post("/upload/{bucket_name}/{folder_path:path}", tags=["upload"], response_model=FileUploadResponse)
 def upload_file(
     bucket_name: str,
     file: UploadFile,
     folder_path: str,
+    background_tasks: BackgroundTasks,
     format: str = None,
     width: int = None,
     height: int = None,
@@ -283,6 +833,7 @@ def upload_file(
             db.commit()
             db.refresh(new_file)
             file_key = str(new_file.id) + (f".{file_extension}" if file_extension else "")
+            new_file.file_key = file_key
             current_file_id = new_file.id
 
         try:
@@ -293,35 +844,16 @@ def upload_file(
                 if file_type == "image":
                     logger.info("Processing image for format/resize")
                     try:
-                        img = Image.open(file.file)
-                        original_width, original_height = img.size  # اندازه اصلی تصویر
-
-                        if width and height:
-                            logger.info(f"Resizing image to width={width}, height={height}")
-                            img = img.resize((width, height))
-                            
-                        elif width:
-                            # محاسبه نسبت طول برای حفظ نسبت ابعاد
-                            new_height = int((width / original_width) * original_height)
-                            logger.info(f"Resizing image to width={width}, height={new_height} (aspect ratio preserved)")
-                            img = img.resize((width, new_height))
-
-                        elif height:
-                            # محاسبه نسبت عرض برای حفظ نسبت ابعاد
-                            new_width = int((height / original_height) * original_width)
-                            logger.info(f"Resizing image to width={new_width}, height={height} (aspect ratio preserved)")
-                            img = img.resize((new_width, height))
+                        logger.info(f"Transforming image to width={width}, height={height}, format={format}")
+                        transformed = image_transformer.transform(file.file.read(), width, height, format or file_extension)
 
                         if format:
-                            logger.info(f"Converting image to format={format}")
                             file_extension = format.lower()
-                            
-                        img_io = BytesIO()
-                        img.save(img_io, format=format.upper() if format else img.format)
-                        img_io.seek(0)
 
-                        file.file = img_io
+                        file.file = BytesIO(transformed)
                         file.content_type = f"image/{file_extension}"
+                    except HTTPException as e:
+                        raise e
                     except Exception as e:
                         logger.error(f"Error processing image: {e}")
                         raise HTTPException(status_code=400, detail="Error processing image for format/resize")
@@ -330,19 +862,48 @@ def upload_file(
                     logger.info("در حال حاضر قابلیت کانورت این نوع فایل را نداریم")                    
                     raise HTTPException(status_code=400, detail="در حال حاضر قابلیت کانورت این نوع فایل را نداریم")
 
-            result = upload_file_to_minio(bucket_name, folder_path, file_key, file.file)            
+            if existing_file:
+                previous_object_name = object_name_of(existing_file)
+                # اگر فایل‌های دیگری آبجکت این فایل را می‌خوانند، پیش از بازنویسی به کلید دیگری کپی می‌شود؛
+                # ارجاع‌ها تا ذخیره شدن محتوای جدید دست نمی‌خورند
+                relocated_to = relocate_blob(db, existing_file)
+                variant_cache.invalidate(existing_file.id)
+                presigned_url_cache.invalidate(existing_file.bucket_name, previous_object_name)
+                hot_object_cache.invalidate(existing_file.bucket_name, previous_object_name)
+                chunk_cache.invalidate(existing_file.bucket_name, previous_object_name)
+
+            # هش محتوا در همان خواندنی که آپلود انجام می‌دهد محاسبه می‌شود
+            stream = SizeLimitedStream(file.file, settings.MAX_FILE_SIZE, file.filename)
+            result = upload_file_to_minio(bucket_name, folder_path, file_key, stream)
             version_id = getattr(result, "version_id", None)
 
             if not version_id:
                 logger.warning("Version ID is None. Check if versioning is enabled in the bucket.")
 
-            file_size = file.file.seek(0, 2)
+            file_size = stream.bytes_read
+            content_hash = stream.sha256.hexdigest()
+            if existing_file:
+                release_blob(db, existing_file, relocated_to)
+                # مشتقات محتوای قبلی حذف می‌شوند؛ اگر فایل جدید تصویر باشد دوباره ساخته می‌شوند
+                clear_derivatives(db, existing_file)
+                existing_file.file_key = file_key
+                if file_size > 0 and not find_blobs(db, bucket_name, [content_hash]).get(content_hash):
+                    register_blob(db, existing_file, content_hash, file_size)
+            elif file_size > 0:
+                # اگر همین محتوا قبلاً در باکت ذخیره شده باشد، آبجکت تازه حذف و به blob موجود ارجاع داده می‌شود
+                blob = find_blobs(db, bucket_name, [content_hash]).get(content_hash)
+                if blob:
+                    logger.info(f"Duplicate content, linking to blob {blob.object_name}")
+                    object_name = f"{folder_path}/{file_key}" if folder_path else file_key
+                    minio_client.remove_object(bucket_name, object_name, version_id=version_id)
+                    link_blob(db, new_file, blob)
+                    version_id = None
+                else:
+                    register_blob(db, new_file, content_hash, file_size)
 
             if file_size <= 0:
                 logger.error("Invalid file size detected")
                 raise HTTPException(status_code=400, detail="Invalid file size")
-            
-            file.file.seek(0)
 
             public_url = f"https://{settings.BASE_DOMAIN}/files/download/public-url"
 
@@ -364,6 +925,11 @@ def upload_file(
                 existing_file.file_type = file.content_type
                 db.commit()
                 db.refresh(existing_file)
+                # دانلود همزمان ممکن است پیش از commit، بایت‌های قبلی را دوباره در کش گذاشته باشد
+                hot_object_cache.invalidate(existing_file.bucket_name, previous_object_name)
+                hot_object_cache.invalidate(existing_file.bucket_name, object_name_of(existing_file))
+                chunk_cache.invalidate(existing_file.bucket_name, previous_object_name)
+                chunk_cache.invalidate(existing_file.bucket_name, object_name_of(existing_file))
                 updated_file = existing_file
                 
             else:
@@ -376,35 +942,30 @@ def upload_file(
                 db.commit()
                 updated_file = new_file        
 
+            if is_derivable_image(updated_file):
+                background_tasks.add_task(generate_derivatives, updated_file.id)
+
             logger.info("File uploaded successfully")
-            return {
-                "message": "File uploaded successfully",
-                "file_id": str(updated_file.id),
-                "name": updated_file.file_name,
-                "file_key": updated_file.file_key,
-                "folder_path": updated_file.folder_path,
-                "file_type": updated_file.file_type,
-                "extension": updated_file.file_extension,
-                "size": updated_file.file_size,
-                "version_id": updated_file.version_id,
-                "human_readable_size": human_readable_size(updated_file.file_size),
-                "last_modified": updated_file.created_at.isoformat(),
-                "etag": str(updated_file.id) if updated_file.id is not None else None,
-                "public_url": public_url
-            }
+            return file_upload_response(updated_file)
 
         except Exception as upload_error:
             logger.error(f"Upload to MinIO failed: {str(upload_error)}")
-            if not current_file_id:
+            if create_new_flg:
+                db.rollback()
                 db.delete(new_file)
                 db.commit()
-            try:
-                logger.info(f"Removing file from MinIO: {file_key}")
-                minio_client.remove_object(bucket_name, file_key)
-            except Exception as remove_error:
-                logger.error(f"Failed to remove file from MinIO: {str(remove_error)}")
+                try:
+                    object_name = f"{folder_path}/{file_key}" if folder_path else file_key
+                    logger.info(f"Removing file from MinIO: {object_name}")
+                    minio_client.remove_object(bucket_name, object_name)
+                except Exception as remove_error:
+                    logger.error(f"Failed to remove file from MinIO: {str(remove_error)}")
+            if isinstance(upload_error, HTTPException):
+                raise upload_error
             raise HTTPException(status_code=500, detail=f"Upload to MinIO failed: {str(upload_error)}")
 
+    except HTTPException as e:
+        raise e
     except Exception as e:
         logger.error(f"Unexpected error occurred: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -535,14 +1096,14 @@ async def get_objects_in_bucket(bucket_name: str, folder_path: str, db: Session
     if not folder_path_validat(folder_path) and folder_path != "":
         raise HTTPException(status_code=404, detail=f"folder path is not valid")   
 
-    if not minio_client.bucket_exists(bucket_name):
+    if not await async_storage.bucket_exists(bucket_name):
         raise HTTPException(status_code=404, detail=f"Bucket '{bucket_name}' does not exist")
     
-    if not does_path_exist(bucket_name, folder_path) and folder_path != "":
+    if not await async_storage.path_exists(bucket_name, folder_path) and folder_path != "":
         raise HTTPException(status_code=404, detail=f"Bucket '{bucket_name}' have not exist this path '{folder_path}'")
 
     try:        
-        objects = list_objects_in_bucket(bucket_name, folder_path)
+        objects = await async_storage.list_objects(bucket_name, folder_path)
         detailed_objects = []
         subfolders = set()
 
@@ -556,6 +1117,8 @@ async def get_objects_in_bucket(bucket_name: str, folder_path: str, db: Session
             if "/" in relative_path:
                 # فولدر فرعی
                 subfolder_name = relative_path.split('/')[0]  # استخراج نام فولدر فرعی
+                if subfolder_name.startswith("."):
+                    continue  # فولدرهای داخلی مثل .derivatives نمایش داده نمی‌شوند
                 if subfolder_name and subfolder_name not in subfolders:
                     subfolders.add(subfolder_name)
                     detailed_objects.append({
@@ -597,6 +1160,31 @@ async def get_objects_in_bucket(bucket_name: str, folder_path: str, db: Session
                     "in_database": bool(file_record),  # آیا فایل در دیتابیس موجود است؟
                 })
 
+        # فایل‌هایی که به محتوای مشترک ارجاع می‌دهند آبجکت مستقلی در این مسیر ندارند
+        listed_keys = {obj["file_key"] for obj in detailed_objects if obj["type"] == "file"}
+        linked_files = db.query(FileModel).join(FileBlobRef, FileBlobRef.file_id == FileModel.id).filter(
+            FileModel.bucket_name == bucket_name,
+            FileModel.folder_path == folder_path
+        ).all()
+        folder_pathes = folder_path.split('/')
+        for file_record in linked_files:
+            if file_record.file_key in listed_keys:
+                continue
+            detailed_objects.append({
+                "type": "file",
+                "folder_name": folder_pathes[len(folder_pathes)-1],
+                "full_path": folder_path,
+                "file_name": file_record.file_name,
+                "file_id": str(file_record.id),
+                "file_key": file_record.file_key,
+                "size": int(file_record.file_size),
+                "human_readable_size": human_readable_size(int(file_record.file_size)),
+                "last_modified": file_record.created_at,
+                "etag": None,
+                "file_type": file_record.file_type,
+                "in_database": True,
+            })
+
         return {"bucket_name": bucket_name, "folder_path": folder_path, "objects": detailed_objects}
     except HTTPException as e:
         raise e 
@@ -637,13 +1225,19 @@ def delete_object(bucket_name: str, folder_path: str, current_file_id: str, user
         if existing_file.user_id != user_id:
             raise HTTPException(status_code=403, detail="Permission denied: You can only delete your own objects")
 
-        # حذف آبجکت از MinIO
+        # حذف آبجکت از MinIO (فقط وقتی فایل دیگری از همین محتوا استفاده نکند)
         try:
-            minio_client.remove_object(bucket_name, full_object_key)
+            if release_blob(db, existing_file):
+                minio_client.remove_object(bucket_name, full_object_key)
         except S3Error as e:
             raise HTTPException(status_code=500, detail=f"Failed to remove object from MinIO: {str(e)}")
 
         # حذف رکورد از دیتابیس
+        clear_derivatives(db, existing_file)
+        variant_cache.invalidate(existing_file.id)
+        presigned_url_cache.invalidate(bucket_name, full_object_key)
+        hot_object_cache.invalidate(bucket_name, full_object_key)
+        chunk_cache.invalidate(bucket_name, full_object_key)
         db.delete(existing_file)
         db.commit()
 
@@ -664,16 +1258,7 @@ def generate_presigned_url(bucket_name: str, folder_path: str, current_file_id:
     if not folder_path_validat(folder_path) and folder_path != "":
         raise HTTPException(status_code=404, detail=f"folder path is not valid")   
     
-    if not minio_client.bucket_exists(bucket_name):
-        raise HTTPException(status_code=404, detail=f"Bucket '{bucket_name}' does not exist")
- 
-    if not does_path_exist(bucket_name, folder_path) and folder_path != "":
-        raise HTTPException(status_code=404, detail=f"Bucket '{bucket_name}' have not exist this path '{folder_path}'")
-    
     try:
-        # محاسبه زمان انقضا به ثانیه
-        expiry_seconds = timedelta(seconds=expiry_seconds)  # تبدیل به عدد صحیح برای ثانیه
-
         existing_file = db.query(FileModel).filter(
             FileModel.bucket_name == bucket_name and  
             FileModel.id == current_file_id and 
@@ -683,11 +1268,22 @@ def generate_presigned_url(bucket_name: str, folder_path: str, current_file_id:
         if not existing_file:
             raise HTTPException(status_code=404, detail="File not found in database")
 
-        # Combine folder path and object name to get full object key
-        full_object_key = f"{folder_path}/{existing_file.file_key}" if folder_path else existing_file.file_key
+        # لینک معتبر قبلی برای همین آبجکت بدون رفت‌وبرگشت به MinIO برگردانده می‌شود
+        object_name, _ = resolve_object(existing_file)
+        cached = presigned_url_cache.lookup(bucket_name, object_name, None, expiry_seconds)
+        # لینک کش‌شده فقط به اندازه‌ی باقی‌مانده‌ی عمرش معتبر است
+        presigned_url, expires_in = cached if cached else (None, expiry_seconds)
+
+        if presigned_url is None:
+            if not minio_client.bucket_exists(bucket_name):
+                raise HTTPException(status_code=404, detail=f"Bucket '{bucket_name}' does not exist")
+        
+            if not does_path_exist(bucket_name, folder_path) and folder_path != "":
+                raise HTTPException(status_code=404, detail=f"Bucket '{bucket_name}' have not exist this path '{folder_path}'")
 
-        # تولید لینک موقت
-        presigned_url = minio_client.presigned_get_object(bucket_name, full_object_key, expires=expiry_seconds)
+            # تولید لینک موقت
+            presigned_url = minio_client.presigned_get_object(bucket_name, object_name, expires=timedelta(seconds=expiry_seconds))
+            presigned_url_cache.put(bucket_name, object_name, None, expiry_seconds, presigned_url)
 
         return {
             "message": "Presigned URL generated successfully",
@@ -695,8 +1291,10 @@ def generate_presigned_url(bucket_name: str, folder_path: str, current_file_id:
             "folder_path": folder_path,
             "file_key": existing_file.file_key,
             "presigned_url": presigned_url,
-            "expires_in": expiry_seconds
+            "expires_in": timedelta(seconds=expires_in)
         }
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate presigned URL: {str(e)}")
 
@@ -711,10 +1309,10 @@ async def generate_presigned_url_with_redis(
     if not folder_path_validat(folder_path) and folder_path != "":
         raise HTTPException(status_code=404, detail=f"folder path is not valid")   
     
-    if not minio_client.bucket_exists(bucket_name):
+    if not await async_storage.bucket_exists(bucket_name):
         raise HTTPException(status_code=404, detail=f"Bucket '{bucket_name}' does not exist")
  
-    if not does_path_exist(bucket_name, folder_path) and folder_path != "":
+    if not await async_storage.path_exists(bucket_name, folder_path) and folder_path != "":
         raise HTTPException(status_code=404, detail=f"Bucket '{bucket_name}' have not exist this path '{folder_path}'")
     
     try:
@@ -758,6 +1356,94 @@ async def generate_presigned_url_with_redis(
     
     
 
+@file_router.post("/generate/batch", tags=["generate url"], summary="Generate download URLs for many files")
+async def generate_presigned_urls_batch(
+    file_ids: List[UUID],
+    url_type: str = "minio",
+    bucket_name: Optional[str] = None,
+    expiry_seconds: int = 12,
+    db: Session = Depends(get_db),
+    request: Request = None
+):
+    """
+    تولید لینک موقت برای چند فایل با یک کوئری دیتابیس.
+    url_type=minio لینک امضاشده‌ی MinIO (امضا به صورت محلی) و url_type=api لینک API با نشست Redis
+    (همه‌ی نشست‌ها در یک pipeline) برمی‌گرداند. خطای هر شناسه جداگانه گزارش می‌شود.
+    """
+    if url_type not in ("minio", "api"):
+        raise HTTPException(status_code=400, detail="url_type must be 'minio' or 'api'")
+    if len(file_ids) > settings.BATCH_PRESIGN_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BATCH_PRESIGN_MAX_IDS} file IDs are allowed per request")
+
+    file_ids = list(dict.fromkeys(file_ids))
+    files = {file_record.id: file_record for file_record in get_files(db, file_ids, bucket_name)}
+    errors = [{"file_id": str(file_id), "error": "File not found in database"} for file_id in file_ids if file_id not in files]
+    found = [files[file_id] for file_id in file_ids if file_id in files]
+
+    def link_info(file_record: FileModel, url: str, expires_in: int) -> dict:
+        return {
+            "file_id": str(file_record.id),
+            "bucket_name": file_record.bucket_name,
+            "folder_path": file_record.folder_path,
+            "file_key": file_record.file_key,
+            "url": url,
+            "expires_in": expires_in,
+        }
+
+    urls = []
+    if url_type == "minio":
+        def sign_all():
+            # امضای لینک‌ها محلی است؛ MinIO فقط یک بار برای region هر باکت پرسیده می‌شود
+            signed = []
+            for file_record in found:
+                object_name, _ = resolve_object(file_record)
+                try:
+                    cached = presigned_url_cache.lookup(file_record.bucket_name, object_name, None, expiry_seconds)
+                    url, expires_in = cached if cached else (None, expiry_seconds)
+                    if url is None:
+                        url = minio_client.presigned_get_object(
+                            file_record.bucket_name, object_name, expires=timedelta(seconds=expiry_seconds)
+                        )
+                        presigned_url_cache.put(file_record.bucket_name, object_name, None, expiry_seconds, url)
+                    signed.append((file_record, url, expires_in, None))
+                except Exception as e:
+                    signed.append((file_record, None, None, str(e)))
+            return signed
+
+        for file_record, url, expires_in, error in await run_storage_io(sign_all):
+            if error:
+                errors.append({"file_id": str(file_record.id), "error": f"Failed to generate presigned URL: {error}"})
+            else:
+                urls.append(link_info(file_record, url, expires_in))
+    else:
+        sessions = []
+        for file_record in found:
+            session_id = str(uuid4())
+            session_data = {
+                "current_file_id": str(file_record.id),
+                "file_key": file_record.file_key,
+                "bucket_name": file_record.bucket_name,
+                "folder_path": file_record.folder_path,
+                "version_id": file_record.version_id
+            }
+            sessions.append((session_id, expiry_seconds, json.dumps(session_data, ensure_ascii=False).encode("utf-8")))
+
+        results = await setex_many(sessions) if sessions else []
+        for file_record, (session_id, _, _), error in zip(found, sessions, results):
+            if error:
+                errors.append({"file_id": str(file_record.id), "error": f"Failed to store session in Redis: {error}"})
+            else:
+                urls.append(link_info(file_record, f"{request.base_url}files/download/api-url/{session_id}", expiry_seconds))
+
+    return {
+        "message": "Presigned URLs generated",
+        "url_type": url_type,
+        # لینک‌های کش‌شده زودتر منقضی می‌شوند؛ عمر هر لینک در expires_in خودش آمده است
+        "expires_in": min([link["expires_in"] for link in urls], default=expiry_seconds),
+        "urls": urls,
+        "errors": errors,
+    }
+
 @file_router.get("/download/base64/{bucket_name}/{folder_path:path}/{current_file_id}", tags=["download"])
 async def download_file_as_base64(
     bucket_name: str,
@@ -766,20 +1452,23 @@ async def download_file_as_base64(
     version_id: str = None,
     width: int = None,
     height: int = None,
+    size: str = None,
+    format: str = None,
     request: Request = None,
     db: Session = Depends(get_db),
 ):
     """
     دانلود فایل از MinIO و بازگرداندن آن به فرمت Base64 از مسیر مشخص.
+    پاسخ JSON به صورت استریم ساخته می‌شود و فایل هیچ‌وقت کامل در حافظه نگه داشته نمی‌شود.
     """
     folder_path = convert_folder_path_to_validate_path(folder_path)
     if not folder_path_validat(folder_path) and folder_path != "":
         raise HTTPException(status_code=404, detail=f"folder path is not valid")   
     
-    if not minio_client.bucket_exists(bucket_name):
+    if not await async_storage.bucket_exists(bucket_name):
         raise HTTPException(status_code=404, detail=f"Bucket '{bucket_name}' does not exist")
  
-    if not does_path_exist(bucket_name, folder_path) and folder_path != "":
+    if not await async_storage.path_exists(bucket_name, folder_path) and folder_path != "":
         raise HTTPException(status_code=404, detail=f"Bucket '{bucket_name}' have not exist this path '{folder_path}'")
     
     try:
@@ -805,55 +1494,63 @@ async def download_file_as_base64(
             raise HTTPException(status_code=404, detail="File not found in database")
 
 
-        # Combine folder path and object name to get full object key
-        full_object_key = f"{folder_path}/{existing_file.file_key}" if folder_path else existing_file.file_key
+        # اگر اندازه‌ی استاندارد از قبل ساخته شده باشد، همان آبجکت بدون پردازش استریم می‌شود
+        derivative = find_derivative(db, existing_file, size, width, height, version_id)
+        if derivative:
+            object_name, object_version = derivative.object_name, None
+            width = height = None
+        else:
+            object_name, object_version = resolve_object(existing_file, version_id)
+            if size and not (width or height):
+                width = settings.IMAGE_DERIVATIVE_SIZES.get(size)
+
+        if format and format.lower() not in RASTER_IMAGE_EXTENSIONS:
+            raise HTTPException(status_code=400, detail=f"Unsupported image format '{format}'")
+        output_extension = format or existing_file.file_extension
 
-        # دریافت فایل از MinIO
+        # دریافت مشخصات آبجکت از MinIO
         try:
-            if version_id:
-                response = minio_client.get_object(bucket_name, full_object_key, version_id=version_id)
-            else:
-                response = minio_client.get_object(bucket_name, full_object_key)
+            stat = await async_storage.stat_object(bucket_name, object_name, version_id=object_version)
         except S3Error as e:
             logger.error(f"MinIO error: {e.code} - {e.message}")
             raise HTTPException(status_code=404, detail=f"MinIO error: {e.message}")
 
-        # اگر فایل یک تصویر باشد، تغییر اندازه انجام شود
-        if existing_file.file_type.startswith("image/") and (width or height):
+        # سقف Base64 روی بایت‌هایی اعمال می‌شود که واقعاً ارسال می‌شوند (نسخه‌ی تغییر اندازه یا فایل اصلی)
+        too_large = HTTPException(
+            status_code=413,
+            detail=f"File is larger than {human_readable_size(settings.BASE64_MAX_SIZE)}; use a download URL instead of Base64"
+        )
+
+        # اگر فایل یک تصویر باشد، نسخه‌ی تغییر اندازه داده‌شده از کش (یا با ساختن آن) برگردانده شود
+        media_type = existing_file.file_type
+        if existing_file.file_type.startswith("image/") and (width or height or format):
             try:
-                img = Image.open(BytesIO(response.read()))
-                original_width, original_height = img.size
-
-                # محاسبه ابعاد جدید
-                if width and height:
-                    img = img.resize((width, height))
-                elif width:
-                    new_height = int((width / original_width) * original_height)
-                    img = img.resize((width, new_height))
-                elif height:
-                    new_width = int((height / original_height) * original_width)
-                    img = img.resize((new_width, height))
-
-                # ذخیره تصویر تغییر یافته در حافظه
-                img_io = BytesIO()                
-                img.save(img_io, format=existing_file.file_extension)
-                img_io.seek(0)
-
-                # تبدیل تصویر تغییر یافته به Base64
-                base64_encoded_file = base64.b64encode(img_io.read()).decode("utf-8")
+                resized = await render_variant(
+                    existing_file.id, bucket_name, object_name, object_version,
+                    stat.version_id or stat.etag, width, height, output_extension,
+                )
+                if len(resized) > settings.BASE64_MAX_SIZE:
+                    raise too_large
+                media_type = image_media_type(output_extension)
+                chunks = iter_bytes(resized)
+            except HTTPException as e:
+                raise e
             except Exception as e:
                 logger.error(f"Error resizing image: {e}")
                 raise HTTPException(status_code=400, detail="Error resizing image")
         else:
-            # اگر تصویر نیست یا ابعاد داده نشده‌اند، به صورت معمولی به Base64 تبدیل شود
-            base64_encoded_file = base64.b64encode(response.read()).decode("utf-8")
+            # اگر تصویر نیست یا ابعاد داده نشده‌اند، بایت‌ها مستقیماً از استریم MinIO به Base64 تبدیل شوند
+            if stat.size > settings.BASE64_MAX_SIZE:
+                raise too_large
+            response = await async_storage.get_object(bucket_name, object_name, version_id=object_version)
+            chunks = async_storage.iter_object(response, BASE64_CHUNK_SIZE)
 
         # افزایش شمارش دانلود
         existing_file.download_count += 1
         db.commit()
 
-        # بازگرداندن فایل به صورت Base64 همراه با اطلاعات
-        return {
+        # بازگرداندن فایل به صورت Base64 همراه با اطلاعات (base64_data آخرین فیلد است و استریم می‌شود)
+        envelope = {
             "message": "File downloaded and converted to Base64 successfully",
             "file_id": str(existing_file.id),
             "file_name": existing_file.file_name,
@@ -862,8 +1559,11 @@ async def download_file_as_base64(
             "file_extension": existing_file.file_extension,
             "bucket_name": bucket_name,
             "folder_path": folder_path,
-            "base64_data": f"data:{existing_file.file_type};base64,{base64_encoded_file}"
         }
+        return StreamingResponse(
+            stream_base64_json(envelope, "base64_data", f"data:{media_type};base64,", chunks),
+            media_type="application/json",
+        )
 
     except HTTPException as e:
         raise e
@@ -879,11 +1579,15 @@ async def download_file_through_api(
     version_id: str = None,
     width: int = None,
     height: int = None,
+    size: str = None,
+    format: str = None,
+    redirect: bool = None,
     request: Request = None,
     db: Session = Depends(get_db),
 ):
     """
     دانلود فایل از MinIO به صورت واسطه (API به MinIO) از مسیر مشخص.
+    در حالت redirect (پارامتر redirect یا تنظیم باکت) به لینک موقت MinIO ارجاع داده می‌شود.
     """
     logger.warning(1)
     folder_path = convert_folder_path_to_validate_path(folder_path)
@@ -912,75 +1616,128 @@ async def download_file_through_api(
         existing_file = db.query(FileModel).filter(      
             FileModel.id == current_file_id      
         ).first()
-        
-        if not minio_client.bucket_exists(existing_file.bucket_name):
-            raise HTTPException(status_code=404, detail=f"Bucket '{bucket_name}' does not exist")
-        logger.warning(4)
-    
-        if not does_path_exist(existing_file.bucket_name, existing_file.folder_path) and existing_file.folder_path != "":
-            raise HTTPException(status_code=404, detail=f"Bucket '{bucket_name}' have not exist this path '{folder_path}'")
-        logger.warning(5)
 
         if not existing_file:
             raise HTTPException(status_code=404, detail="File not found in database")
+        
+        # اگر اندازه‌ی استاندارد از قبل ساخته شده باشد، همان آبجکت بدون پردازش استریم می‌شود
+        derivative = find_derivative(db, existing_file, size, width, height, version_id)
+        if derivative:
+            object_name, object_version = derivative.object_name, None
+            width = height = None
+        else:
+            object_name, object_version = resolve_object(existing_file, version_id)
+            if size and not (width or height):
+                width = settings.IMAGE_DERIVATIVE_SIZES.get(size)
+
+        if format and format.lower() not in RASTER_IMAGE_EXTENSIONS:
+            raise HTTPException(status_code=400, detail=f"Unsupported image format '{format}'")
+        output_extension = format or existing_file.file_extension
+        resize = existing_file.file_type.startswith("image/") and (width or height or format)
+
+        # حالت redirect: بایت‌ها مستقیماً از MinIO سرو می‌شوند؛ درخواست‌های تغییر اندازه همچنان از API عبور می‌کنند
+        if redirect is None:
+            redirect = settings.BUCKET_DOWNLOAD_MODES.get(existing_file.bucket_name, settings.DEFAULT_DOWNLOAD_MODE) == "redirect"
+        if redirect and not resize:
+            disposition = f"attachment; filename*=UTF-8''{quote(existing_file.file_name)}"
+            presigned_url = presigned_url_cache.get(
+                existing_file.bucket_name, object_name, object_version, settings.REDIRECT_URL_EXPIRY, disposition
+            )
+            if presigned_url is None:
+                presigned_url = await async_storage.presigned_get_object(
+                    existing_file.bucket_name,
+                    object_name,
+                    expires=timedelta(seconds=settings.REDIRECT_URL_EXPIRY),
+                    version_id=object_version,
+                    response_headers={"response-content-disposition": disposition},
+                )
+                presigned_url_cache.put(
+                    existing_file.bucket_name, object_name, object_version, settings.REDIRECT_URL_EXPIRY, presigned_url, disposition
+                )
+            existing_file.download_count += 1
+            db.commit()
+            return RedirectResponse(presigned_url, status_code=302, headers={"Cache-Control": "no-store"})
 
-        # Combine folder path and object name to get full object key
-        full_object_key = f"{existing_file.folder_path}/{existing_file.file_key}" if existing_file.folder_path else existing_file.file_key
+        # آبجکت‌های کوچک پرتکرار از حافظه سرو می‌شوند (بدون بررسی باکت، stat و GET به MinIO)
+        hot = hot_object_cache.get(existing_file.bucket_name, object_name, object_version)
+        if hot:
+            stat = hot.stat
+        else:
+            if not await async_storage.bucket_exists(existing_file.bucket_name):
+                raise HTTPException(status_code=404, detail=f"Bucket '{bucket_name}' does not exist")
+            logger.warning(4)
+        
+            if not await async_storage.path_exists(existing_file.bucket_name, existing_file.folder_path) and existing_file.folder_path != "":
+                raise HTTPException(status_code=404, detail=f"Bucket '{bucket_name}' have not exist this path '{folder_path}'")
+            logger.warning(5)
 
-        # دریافت فایل از MinIO
-        try:
-            if version_id:
-                response = minio_client.get_object(existing_file.bucket_name, full_object_key, version_id=version_id)
-            else:
-                response = minio_client.get_object(existing_file.bucket_name, full_object_key)
-        except S3Error as e:
-            logger.error(f"MinIO error: {e.code} - {e.message}")
-            raise HTTPException(status_code=404, detail=f"MinIO error: {e.message}")
+            # دریافت مشخصات آبجکت از MinIO (اندازه و etag برای پاسخ‌های بازه‌ای)
+            try:
+                stat = await async_storage.stat_object(existing_file.bucket_name, object_name, version_id=object_version)
+            except S3Error as e:
+                logger.error(f"MinIO error: {e.code} - {e.message}")
+                raise HTTPException(status_code=404, detail=f"MinIO error: {e.message}")
+
+        # اعتبارسنج‌ها و سیاست کش؛ اگر کلاینت نسخه‌ی فعلی را دارد بدون باز کردن آبجکت 304 برگردانده می‌شود
+        cache_headers = {
+            **object_validators(stat),
+            "Cache-Control": cache_control_for(existing_file.bucket_name, versioned=bool(version_id)),
+        }
+        if resize:
+            cache_headers["ETag"] = variant_etag(cache_headers["ETag"], width, height, format)
+        if is_not_modified(request.headers, cache_headers["ETag"], stat.last_modified):
+            return Response(status_code=304, headers=cache_headers)
 
         # افزایش شمارش دانلود
         existing_file.download_count += 1
         db.commit()
 
         # اگر فایل یک تصویر باشد و ابعاد داده شده باشد، تغییر اندازه انجام شود
-        if existing_file.file_type.startswith("image/") and (width or height):
+        if resize:
             try:
-                img = Image.open(BytesIO(response.read()))
-                original_width, original_height = img.size
-
-                # محاسبه ابعاد جدید
-                if width and height:
-                    img = img.resize((width, height))
-                elif width:
-                    new_height = int((width / original_width) * original_height)
-                    img = img.resize((width, new_height))
-                elif height:
-                    new_width = int((height / original_height) * original_width)
-                    img = img.resize((new_width, height))
-
-                # ذخیره تصویر تغییر یافته در حافظه
-                img_io = BytesIO()                
-                img.save(img_io, format=existing_file.file_extension)
-                img_io.seek(0)
-
-                # بازگرداندن تصویر تغییر یافته به صورت استریم
-                return StreamingResponse(
-                        stream_buffered(img_io),  # ارسال داده‌ها به صورت چانک
-                        media_type=f"image/{existing_file.file_extension}",
-                        headers={
-                            "Content-Disposition": f"attachment; filename*=UTF-8''{quote(existing_file.file_name)}"
-                        },
-                    )
+                resized = await render_variant(
+                    existing_file.id, existing_file.bucket_name, object_name, object_version,
+                    stat.version_id or stat.etag, width, height, output_extension,
+                )
+                # بازگرداندن تصویر تغییر یافته (از کش یا تازه ساخته‌شده)
+                return Response(
+                    content=resized,
+                    media_type=image_media_type(output_extension),
+                    headers={
+                        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(existing_file.file_name)}",
+                        **cache_headers,
+                    },
+                )
+            except HTTPException as e:
+                raise e
             except Exception as e:
                 logger.error(f"Error resizing image: {e}")
                 raise HTTPException(status_code=400, detail="Error resizing image")
         else:      
-            # اگر تصویر نیست یا ابعاد داده نشده‌اند، فایل اصلی بازگردانده شود
-            return StreamingResponse(
-                stream_minio_object(response),
-                media_type="application/octet-stream",
-                headers={
-                    "Content-Disposition": f"attachment; filename*=UTF-8''{quote(existing_file.file_name)}"
-                },
+            # اگر تصویر نیست یا ابعاد داده نشده‌اند، فایل اصلی (با پشتیبانی از Range) بازگردانده شود
+            data = hot.data if hot else None
+            if data is None and hot_object_cache.cacheable(stat.size):
+                data = await fetch_hot_object(existing_file.bucket_name, object_name, object_version, stat)
+
+            # فایل‌های بزرگ (ویدیو و ...) از چانک‌های کش‌شده روی دیسک خوانده می‌شوند
+            reader = None
+            if data is None and chunk_cache.cacheable(stat.size):
+                reader = partial(
+                    chunk_cache.iter_range, existing_file.bucket_name, object_name, object_version, stat.version_id or stat.etag, stat.size
+                )
+            elif data is None:
+                # بین سقف کش داغ و کش چانک: دانلودهای همزمان یک GET مشترک از MinIO را می‌خوانند
+                reader = partial(shared_object_stream.iter_range, existing_file.bucket_name, object_name, object_version, stat)
+            return await ranged_object_response(
+                existing_file.bucket_name,
+                object_name,
+                object_version,
+                request.headers,
+                existing_file.file_name,
+                stat=stat,
+                cache_control=cache_headers["Cache-Control"],
+                data=data,
+                reader=reader,
             )
     except HTTPException as e:
         raise e  # انتقال خطای HTTPException به پاسخ کلاینت
@@ -992,6 +1749,8 @@ async def download_file_with_redis(
     session_id: str,
     width: int = None,
     height: int = None,
+    size: str = None,
+    format: str = None,
     request: Request = None,
     db: Session = Depends(get_db),
 ):
@@ -1054,60 +1813,93 @@ async def download_file_with_redis(
         if not existing_file:
             raise HTTPException(status_code=404, detail="File not found in database")
 
-        # دریافت فایل از MinIO
-        try:
-            if version_id:
-                response = minio_client.get_object(bucket_name, full_object_key, version_id=version_id)
-            else:
-                response = minio_client.get_object(bucket_name, full_object_key)
-        except S3Error as e:
-            logger.error(f"MinIO error: {e.code} - {e.message}")
-            raise HTTPException(status_code=404, detail=f"MinIO error: {e.message}")
+        # اگر اندازه‌ی استاندارد از قبل ساخته شده باشد، همان آبجکت بدون پردازش استریم می‌شود
+        derivative = find_derivative(db, existing_file, size, width, height, version_id)
+        if derivative:
+            object_name, object_version = derivative.object_name, None
+            width = height = None
+        else:
+            object_name, object_version = resolve_object(existing_file, version_id)
+            if size and not (width or height):
+                width = settings.IMAGE_DERIVATIVE_SIZES.get(size)
+
+        if format and format.lower() not in RASTER_IMAGE_EXTENSIONS:
+            raise HTTPException(status_code=400, detail=f"Unsupported image format '{format}'")
+        output_extension = format or existing_file.file_extension
+
+        # دریافت مشخصات آبجکت از MinIO (اندازه و etag برای پاسخ‌های بازه‌ای)؛
+        # آبجکت‌های کوچک پرتکرار از حافظه سرو می‌شوند (بدون stat و GET به MinIO)
+        hot = hot_object_cache.get(bucket_name, object_name, object_version)
+        if hot:
+            stat = hot.stat
+        else:
+            try:
+                stat = await async_storage.stat_object(bucket_name, object_name, version_id=object_version)
+            except S3Error as e:
+                logger.error(f"MinIO error: {e.code} - {e.message}")
+                raise HTTPException(status_code=404, detail=f"MinIO error: {e.message}")
         
+        # اعتبارسنج‌ها و سیاست کش؛ اگر کلاینت نسخه‌ی فعلی را دارد بدون باز کردن آبجکت 304 برگردانده می‌شود
+        resize = existing_file.file_type.startswith("image/") and (width or height or format)
+        cache_headers = {
+            **object_validators(stat),
+            "Cache-Control": cache_control_for(bucket_name, versioned=bool(version_id)),
+        }
+        if resize:
+            cache_headers["ETag"] = variant_etag(cache_headers["ETag"], width, height, format)
+        if is_not_modified(request.headers, cache_headers["ETag"], stat.last_modified):
+            return Response(status_code=304, headers=cache_headers)
+
         # افزایش شمارش دانلود
         existing_file.download_count += 1
         db.commit()
 
         # اگر فایل تصویر است و ابعاد مشخص شده‌اند، تغییر اندازه انجام شود
-        if existing_file.file_type.startswith("image/") and (width or height):
-            try:                               
-                img = Image.open(BytesIO(response.read()))
-                original_width, original_height = img.size
-                
-                # محاسبه ابعاد جدید
-                if width and height:
-                    img = img.resize((width, height))
-                elif width:
-                    new_height = int((width / original_width) * original_height)
-                    img = img.resize((width, new_height))
-                elif height:
-                    new_width = int((height / original_height) * original_width)
-                    img = img.resize((new_width, height))
-
-                # ذخیره تصویر تغییر یافته در حافظه
-                img_io = BytesIO()
-                img.save(img_io, format=existing_file.file_extension)
-                img_io.seek(0)
-
-                # بازگرداندن تصویر تغییر یافته به صورت استریم
-                return StreamingResponse(
-                    stream_buffered(img_io),  # ارسال داده‌ها به صورت چانک
-                    media_type=f"image/{existing_file.file_extension}",
+        if resize:
+            try:
+                resized = await render_variant(
+                    existing_file.id, bucket_name, object_name, object_version,
+                    stat.version_id or stat.etag, width, height, output_extension,
+                )
+                # بازگرداندن تصویر تغییر یافته (از کش یا تازه ساخته‌شده)
+                return Response(
+                    content=resized,
+                    media_type=image_media_type(output_extension),
                     headers={
-                        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(existing_file.file_name)}"
+                        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(existing_file.file_name)}",
+                        **cache_headers,
                     },
                 )
+            except HTTPException as e:
+                raise e
             except Exception as e:
                 logger.error(f"Error resizing image: {e}")
                 raise HTTPException(status_code=400, detail="Error resizing image")
 
-        # بازگرداندن فایل اصلی اگر تصویر نیست یا ابعاد مشخص نشده‌اند
-        return StreamingResponse(
-            stream_minio_object(response),
-            media_type="application/octet-stream",
-            headers={
-                "Content-Disposition": f"attachment; filename*=UTF-8''{quote(existing_file.file_name)}"
-            },
+        # بازگرداندن فایل اصلی (با پشتیبانی از Range) اگر تصویر نیست یا ابعاد مشخص نشده‌اند
+        data = hot.data if hot else None
+        if data is None and hot_object_cache.cacheable(stat.size):
+            data = await fetch_hot_object(bucket_name, object_name, object_version, stat)
+
+        # فایل‌های بزرگ (ویدیو و ...) از چانک‌های کش‌شده روی دیسک خوانده می‌شوند
+        reader = None
+        if data is None and chunk_cache.cacheable(stat.size):
+            reader = partial(
+                chunk_cache.iter_range, bucket_name, object_name, object_version, stat.version_id or stat.etag, stat.size
+            )
+        elif data is None:
+            # بین سقف کش داغ و کش چانک: دانلودهای همزمان یک GET مشترک از MinIO را می‌خوانند
+            reader = partial(shared_object_stream.iter_range, bucket_name, object_name, object_version, stat)
+        return await ranged_object_response(
+            bucket_name,
+            object_name,
+            object_version,
+            request.headers,
+            existing_file.file_name,
+            stat=stat,
+            cache_control=cache_headers["Cache-Control"],
+            data=data,
+            reader=reader,
         )
     except HTTPException as e:
         raise e  # انتقال خطای HTTPException به پاسخ کلاینت
@@ -1115,6 +1907,92 @@ async def download_file_with_redis(
         logger.error(f"Unexpected error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
     
+@file_router.post("/images/responsive/{current_file_id}", tags=["download"], summary="Build srcset variants of an image from a single decode")
+async def build_responsive_images(
+    current_file_id: UUID,
+    widths: List[int] = Query(..., description="Target widths in pixels"),
+    formats: List[str] = Query(None, description="Output formats; defaults to the file's own format"),
+    version_id: str = None,
+    db: Session = Depends(get_db),
+):
+    """
+    ساخت نسخه‌های چند عرض/فرمت یک تصویر با یک بار دیکد و بازگرداندن فهرست لینک‌ها (برای srcset).
+    نسخه‌ها در کش ذخیره می‌شوند و لینک‌ها بدون پردازش دوباره از همان کش سرو می‌شوند.
+    """
+    existing_file = db.query(FileModel).filter(FileModel.id == current_file_id).first()
+    if not existing_file:
+        raise HTTPException(status_code=404, detail="File not found in database")
+    if not is_derivable_image(existing_file):
+        raise HTTPException(status_code=400, detail="Responsive variants are only available for raster images")
+
+    widths = sorted({width for width in widths})
+    formats = list(dict.fromkeys(extension.lower() for extension in (formats or [existing_file.file_extension])))
+    if any(width <= 0 for width in widths):
+        raise HTTPException(status_code=400, detail="Widths must be positive")
+    unsupported = [extension for extension in formats if extension not in RASTER_IMAGE_EXTENSIONS]
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"Unsupported image format(s): {', '.join(unsupported)}")
+    if len(widths) * len(formats) > settings.RESPONSIVE_MAX_VARIANTS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.RESPONSIVE_MAX_VARIANTS} width/format combinations are allowed")
+
+    object_name, object_version = resolve_object(existing_file, version_id)
+    try:
+        stat = await async_storage.stat_object(existing_file.bucket_name, object_name, version_id=object_version)
+    except S3Error as e:
+        logger.error(f"MinIO error: {e.code} - {e.message}")
+        raise HTTPException(status_code=404, detail=f"MinIO error: {e.message}")
+
+    try:
+        # همان کلید کشی که روت دانلود برای ?width=&format= استفاده می‌کند
+        rendered = await render_variant_set(
+            existing_file.id, existing_file.bucket_name, object_name, object_version,
+            stat.version_id or stat.etag, widths, formats,
+        )
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error building responsive images: {e}")
+        raise HTTPException(status_code=400, detail="Error resizing image")
+
+    base_url = f"https://{settings.BASE_DOMAIN}/files/download/public-url/{existing_file.id}"
+    version_query = f"&version_id={quote(version_id)}" if version_id else ""
+    return {
+        "file_id": str(existing_file.id),
+        "file_name": existing_file.file_name,
+        "rendered": len(rendered),
+        "variants": [
+            {
+                "width": width,
+                "format": extension,
+                "media_type": image_media_type(extension),
+                "url": f"{base_url}?width={width}&format={extension}{version_query}",
+            }
+            for extension in formats
+            for width in widths
+        ],
+    }
+
+@file_router.post("/metadata/batch", tags=["metadata"], response_model=FilesMetadataResponse, summary="Metadata of many files by IDs")
+def get_files_metadata(
+    file_ids: List[UUID],
+    bucket_name: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    دریافت متادیتای چند فایل با یک کوئری (بدون هیچ درخواستی به MinIO).
+    """
+    if len(file_ids) > settings.BATCH_METADATA_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.BATCH_METADATA_MAX_IDS} file IDs are allowed per request")
+
+    # حذف شناسه‌های تکراری با حفظ ترتیب درخواست
+    file_ids = list(dict.fromkeys(file_ids))
+    files = {file_record.id: file_record for file_record in get_files(db, file_ids, bucket_name)}
+
+    return {
+        "files": [file_upload_response(files[file_id]) for file_id in file_ids if file_id in files],
+        "not_found": [str(file_id) for file_id in file_ids if file_id not in files],
+    }
+
 @file_router.post("/download/zip-files", tags=["download"], summary="Zip files by IDs")
 async def zip_files_endpoint(
     file_ids: List[UUID],
@@ -1122,7 +2000,7 @@ async def zip_files_endpoint(
     db: Session = Depends(get_db)
 ):
     # Validate bucket if provided
-    if bucket_name and not minio_client.bucket_exists(bucket_name):
+    if bucket_name and not await async_storage.bucket_exists(bucket_name):
         raise HTTPException(status_code=404, detail=f"Bucket '{bucket_name}' does not exist")
 
     # Fetch DB records, applying bucket filter
@@ -1130,25 +2008,15 @@ async def zip_files_endpoint(
     if not files:
         raise HTTPException(status_code=404, detail="No files found matching criteria")
 
-    # Build ZIP in memory
-    zip_buffer = BytesIO()
-    with ZipFile(zip_buffer, "w") as zf:
-        for f in files:
-            full_key = f"{f.folder_path}/{f.file_key}" if hasattr(f, 'folder_path') and f.folder_path else f.file_key
-            try:
-                response = minio_client.get_object(f.bucket_name, full_key)
-                data = response.read()
-                zf.writestr(full_key, data)
-            except Exception as e:
-                # Log and continue
-                print(f"[zip] failed to fetch {full_key}: {e}")
-                continue
+    # Stream the ZIP as members are fetched, prefetching a bounded number of objects ahead
+    members = []
+    for f in files:
+        full_key = f"{f.folder_path}/{f.file_key}" if hasattr(f, 'folder_path') and f.folder_path else f.file_key
+        object_name, _ = resolve_object(f)
+        members.append(ZipMember(full_key, f.bucket_name, object_name, f.file_size, f.file_extension))
 
-    # Return ZIP via Response
-    zip_buffer.seek(0)
-    content = zip_buffer.getvalue()
-    return Response(
-        content=content,
+    return StreamingResponse(
+        stream_zip(members),
         media_type="application/zip",
         headers={"Content-Disposition": 'attachment; filename="files.zip"'}
     )
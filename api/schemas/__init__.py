@@ -1,3 +1,3 @@
 # api/schemas/__init__.py
 
-from .file import FileUploadResponse, FilesUploadResponse
\ No newline at end of file
+from .file import FileUploadResponse, FilesUploadResponse, FilesMetadataResponse
\ No newline at end of file
@@ -33,3 +33,6 @@ class FilesUploadResponse(BaseModel):
     class Config:
         orm_mode = True
 
+class FilesMetadataResponse(BaseModel):
+    files: List[FileUploadResponse] = Field(..., description="Metadata of the files that were found, in request order")
+    not_found: List[str] = Field(..., description="Requested file IDs that do not exist")
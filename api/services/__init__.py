@@ -1,4 +1,6 @@
 # api/services/__init__.py
 
 from .file_service import save_file_to_db, log_request, get_files
-
+from .blob_service import object_name_of, resolve_object, hash_stream, hash_streams, find_blobs, link_blob, register_blob, relocate_blob, release_blob
+from .derivative_service import is_derivable_image, generate_derivatives, find_derivative, clear_derivatives
+from .idempotency_service import scoped_idempotency_key, RequestFingerprint, claim_idempotency_key, get_idempotency_key, complete_idempotency_key, release_idempotency_key
@@ -0,0 +1,163 @@
+# api/services/blob_service.py
+import hashlib
+from typing import Optional, Tuple, List
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from minio.commonconfig import CopySource
+from models import FileModel, FileBlob, FileBlobRef
+from dbs import minio_client
+from configs import settings
+from concurrent.futures import ThreadPoolExecutor
+
+def object_name_of(file_record: FileModel) -> str:
+    """
+    Key of the file's own object in its bucket.
+    """
+    if file_record.folder_path:
+        return f"{file_record.folder_path}/{file_record.file_key}"
+    return file_record.file_key
+
+def resolve_object(file_record: FileModel, version_id: str = None) -> Tuple[str, Optional[str]]:
+    """
+    Object key and version to read for a file; deduplicated files read the shared blob.
+    """
+    own_object_name = object_name_of(file_record)
+    blob = file_record.blob
+    if blob and blob.object_name != own_object_name:
+        return blob.object_name, None
+    return own_object_name, version_id
+
+def hash_stream(stream, chunk_size: int = 1024 * 1024) -> Tuple[str, int]:
+    """
+    SHA-256 and size of a file object, read in chunks and rewound afterwards.
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    stream.seek(0)
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        sha256.update(chunk)
+        size += len(chunk)
+    stream.seek(0)
+    return sha256.hexdigest(), size
+
+def hash_streams(streams: list, max_workers: int = None) -> List[Tuple[str, int]]:
+    """
+    hash_stream over several file objects in parallel, results in input order.
+    """
+    if not streams:
+        return []
+    workers = min(max_workers or settings.UPLOAD_CONCURRENCY, len(streams))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(hash_stream, streams))
+
+def find_blobs(db: Session, bucket_name: str, hashes: List[str]) -> dict:
+    """
+    Existing blobs of a bucket keyed by hash.
+    """
+    if not hashes:
+        return {}
+    blobs = db.query(FileBlob).filter(FileBlob.bucket_name == bucket_name, FileBlob.sha256.in_(hashes)).all()
+    return {blob.sha256: blob for blob in blobs}
+
+def link_blob(db: Session, file_record: FileModel, blob: FileBlob):
+    """
+    Point a file at an existing blob instead of storing its content again.
+    """
+    db.query(FileBlob).filter(FileBlob.id == blob.id).update(
+        {FileBlob.ref_count: FileBlob.ref_count + 1}, synchronize_session=False
+    )
+    db.add(FileBlobRef(file_id=file_record.id, blob_id=blob.id))
+
+def register_blob(db: Session, file_record: FileModel, sha256: str, size: int) -> Optional[FileBlob]:
+    """
+    Record the file's freshly uploaded object as the blob for its hash.
+    Returns None if a concurrent upload registered the same hash first.
+    """
+    blob = FileBlob(
+        sha256=sha256,
+        bucket_name=file_record.bucket_name,
+        object_name=object_name_of(file_record),
+        size=size,
+        ref_count=1
+    )
+    savepoint = db.begin_nested()
+    try:
+        db.add(blob)
+        db.flush()
+        db.add(FileBlobRef(file_id=file_record.id, blob_id=blob.id))
+        db.flush()
+        savepoint.commit()
+        return blob
+    except IntegrityError:
+        savepoint.rollback()
+        return None
+
+def relocate_blob(db: Session, file_record: FileModel) -> Optional[str]:
+    """
+    Before a file's own object is overwritten: if other files still read the blob
+    stored at this file's key, copy it server-side to another referencing file's key.
+    Returns that key (to pass to release_blob) or None if nothing had to be copied.
+    Makes no database changes, so a failed replace leaves the references intact.
+    """
+    ref = db.query(FileBlobRef).filter(FileBlobRef.file_id == file_record.id).first()
+    if not ref:
+        return None
+    blob = db.query(FileBlob).filter(FileBlob.id == ref.blob_id).first()
+    own_object_name = object_name_of(file_record)
+    if not blob or blob.ref_count <= 1 or blob.object_name != own_object_name:
+        return None
+
+    next_file = _next_referencing_file(db, blob, file_record)
+    if not next_file:
+        return None
+    next_object_name = object_name_of(next_file)
+    minio_client.copy_object(blob.bucket_name, next_object_name, CopySource(blob.bucket_name, own_object_name))
+    return next_object_name
+
+def _next_referencing_file(db: Session, blob: FileBlob, file_record: FileModel) -> Optional[FileModel]:
+    next_ref = db.query(FileBlobRef).filter(
+        FileBlobRef.blob_id == blob.id,
+        FileBlobRef.file_id != file_record.id
+    ).first()
+    return db.query(FileModel).filter(FileModel.id == next_ref.file_id).first() if next_ref else None
+
+def release_blob(db: Session, file_record: FileModel, relocated_to: str = None) -> bool:
+    """
+    Drop a file's reference to its blob when the file is deleted or replaced.
+    If other files still use the blob and it lives at this file's key, it is
+    copied server-side to another referencing file first, unless relocate_blob
+    already copied it to `relocated_to`.
+    Returns True if the file's own object may be removed or overwritten.
+    """
+    ref = db.query(FileBlobRef).filter(FileBlobRef.file_id == file_record.id).first()
+    if not ref:
+        return True
+
+    blob = db.query(FileBlob).filter(FileBlob.id == ref.blob_id).with_for_update().first()
+    own_object_name = object_name_of(file_record)
+    db.delete(ref)
+    blob.ref_count -= 1
+
+    if blob.ref_count <= 0:
+        db.delete(blob)
+        return True
+
+    if blob.object_name != own_object_name:
+        # این فایل هرگز آبجکت مستقلی نداشته است
+        return False
+
+    next_file = _next_referencing_file(db, blob, file_record)
+    if not next_file:
+        # ref_count با ردیف‌های FileBlobRef همخوان نیست؛ blob دیگر استفاده‌ای ندارد
+        db.delete(blob)
+        return True
+    next_object_name = object_name_of(next_file)
+    if next_object_name != relocated_to:
+        # اگر آبجکت این فایل بازنویسی شده باشد، نسخه‌ی منتقل‌شده منبع کپی است
+        source_object_name = relocated_to or own_object_name
+        minio_client.copy_object(blob.bucket_name, next_object_name, CopySource(blob.bucket_name, source_object_name))
+    blob.object_name = next_object_name
+    return True
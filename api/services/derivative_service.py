@@ -0,0 +1,135 @@
+# api/services/derivative_service.py
+from io import BytesIO
+from typing import Optional
+from sqlalchemy.orm import Session
+from PIL import Image
+from dbs import SessionLocal, minio_client
+from models import FileModel, FileDerivative
+from configs import settings
+from libs import logger
+from utils import image_transformer, hot_object_cache, RASTER_IMAGE_EXTENSIONS
+from .blob_service import resolve_object
+
+def is_derivable_image(file_record: FileModel) -> bool:
+    return (file_record.file_extension or "").lower() in RASTER_IMAGE_EXTENSIONS
+
+def derivative_object_name(file_record: FileModel, name: str, source_tag: str) -> str:
+    """
+    Key of a derivative, next to the original under a hidden `.derivatives` folder.
+    `source_tag` identifies the original's content, so a job rendering superseded
+    content never overwrites the derivatives of the current one.
+    """
+    key = f".derivatives/{file_record.id}/{source_tag}/{name}.{file_record.file_extension.lower()}"
+    return f"{file_record.folder_path}/{key}" if file_record.folder_path else key
+
+def _source_unchanged(db: Session, file_record: FileModel, source: tuple, source_etag: str) -> bool:
+    db.refresh(file_record)
+    if (file_record.file_key, file_record.version_id, file_record.file_size) != source:
+        return False
+    object_name, object_version = resolve_object(file_record, file_record.version_id)
+    try:
+        stat = minio_client.stat_object(file_record.bucket_name, object_name, version_id=object_version)
+    except Exception:
+        return False
+    return (stat.etag or "").strip('"') == source_etag
+
+def generate_derivatives(file_id: str):
+    """
+    Background job: render the standard sizes of an uploaded image and store them as sibling objects.
+    """
+    db = SessionLocal()
+    try:
+        file_record = db.query(FileModel).filter(FileModel.id == file_id).first()
+        if not file_record or not is_derivable_image(file_record):
+            return
+
+        object_name, object_version = resolve_object(file_record, file_record.version_id)
+        response = minio_client.get_object(file_record.bucket_name, object_name, version_id=object_version)
+        try:
+            data = response.read()
+            source_etag = (response.headers.get("etag") or "").strip('"')
+        finally:
+            response.close()
+            response.release_conn()
+        source = (file_record.file_key, file_record.version_id, file_record.file_size)
+        source_tag = source_etag[:16] or str(file_record.version_id or "latest")
+
+        original_width = Image.open(BytesIO(data)).size[0]
+        content_type = file_record.file_type or f"image/{file_record.file_extension.lower()}"
+
+        for name, width in settings.IMAGE_DERIVATIVE_SIZES.items():
+            rendered = image_transformer.transform(data, width=min(width, original_width), extension=file_record.file_extension)
+            rendered_width, rendered_height = Image.open(BytesIO(rendered)).size
+            derivative_name = derivative_object_name(file_record, name, source_tag)
+            minio_client.put_object(
+                file_record.bucket_name,
+                derivative_name,
+                BytesIO(rendered),
+                length=len(rendered),
+                content_type=content_type
+            )
+
+            # اگر فایل در حین ساخت جایگزین شده باشد، نتیجه‌ی محتوای قدیمی ثبت نمی‌شود
+            if not _source_unchanged(db, file_record, source, source_etag):
+                minio_client.remove_object(file_record.bucket_name, derivative_name)
+                logger.info(f"File {file_id} changed while its derivatives were rendered, discarding them")
+                return
+
+            db.query(FileDerivative).filter(
+                FileDerivative.file_id == file_record.id,
+                FileDerivative.name == name
+            ).delete()
+            db.add(FileDerivative(
+                file_id=file_record.id,
+                name=name,
+                width=rendered_width,
+                height=rendered_height,
+                object_name=derivative_name,
+                size=len(rendered),
+                content_type=content_type,
+                source_version_id=file_record.version_id
+            ))
+            db.commit()
+
+        logger.info(f"Derivatives generated for file {file_id}")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to generate derivatives for file {file_id}: {e}")
+    finally:
+        db.close()
+
+def find_derivative(db: Session, file_record: FileModel, size: str = None, width: int = None, height: int = None, version_id: str = None) -> Optional[FileDerivative]:
+    """
+    Stored derivative matching a named size or an exact width/height, if any.
+    """
+    if not (size or width or height):
+        return None
+    if version_id and version_id != file_record.version_id:
+        return None
+
+    query = db.query(FileDerivative).filter(FileDerivative.file_id == file_record.id)
+    if size:
+        query = query.filter(FileDerivative.name == size)
+    if width:
+        query = query.filter(FileDerivative.width == width)
+    if height:
+        query = query.filter(FileDerivative.height == height)
+    derivative = query.first()
+
+    if derivative and derivative.source_version_id != file_record.version_id:
+        return None
+    return derivative
+
+def clear_derivatives(db: Session, file_record: FileModel, remove_objects: bool = True):
+    """
+    Forget a file's derivatives, e.g. when it is replaced or deleted.
+    """
+    derivatives = db.query(FileDerivative).filter(FileDerivative.file_id == file_record.id).all()
+    for derivative in derivatives:
+        hot_object_cache.invalidate(file_record.bucket_name, derivative.object_name)
+        if remove_objects:
+            try:
+                minio_client.remove_object(file_record.bucket_name, derivative.object_name)
+            except Exception as e:
+                logger.warning(f"Failed to remove derivative {derivative.object_name}: {e}")
+        db.delete(derivative)
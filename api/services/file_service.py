@@ -37,4 +37,7 @@ def get_files(db: Session, file_ids: List[UUID], bucket: str = None) -> List[Fil
     """
     Retrieve FileModel instances from the database by their UUIDs.
     """
-    return db.query(FileModel).filter(FileModel.id.in_(file_ids)).all()
\ No newline at end of file
+    query = db.query(FileModel).filter(FileModel.id.in_(file_ids))
+    if bucket:
+        query = query.filter(FileModel.bucket_name == bucket)
+    return query.all()
\ No newline at end of file
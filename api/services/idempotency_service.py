@@ -0,0 +1,117 @@
+# api/services/idempotency_service.py
+import hashlib
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy.exc import IntegrityError
+from dbs import SessionLocal
+from models import IdempotencyKey
+from configs import settings
+
+def scoped_idempotency_key(key: str, api_key: str = None, user_id: str = None) -> str:
+    """
+    Storage key for an Idempotency-Key, scoped to the caller so clients cannot replay each other's responses.
+    """
+    return hashlib.sha256("\n".join([api_key or "", user_id or "", key]).encode("utf-8")).hexdigest()
+
+class RequestFingerprint:
+    """
+    Running hash of a request's method, path, query and body.
+    A multipart boundary is random per request, so it is left out of the body hash.
+    """
+    def __init__(self, method: str, path: str, query: str, content_type: str = None):
+        self.sha256 = hashlib.sha256("\n".join([method, path, query, ""]).encode("utf-8"))
+        self.complete = False
+        self._boundary = None
+        self._tail = b""
+        if content_type and "boundary=" in content_type:
+            self._boundary = content_type.split("boundary=", 1)[1].split(";", 1)[0].strip().strip('"').encode("latin-1")
+
+    def update(self, chunk: bytes, more_body: bool = True):
+        if self._boundary:
+            data = (self._tail + chunk).replace(self._boundary, b"")
+            keep = len(self._boundary) - 1
+            if more_body and keep:
+                self._tail = data[-keep:]
+                data = data[:-keep]
+            else:
+                self._tail = b""
+        else:
+            data = chunk
+        self.sha256.update(data)
+        if not more_body:
+            self.complete = True
+
+    def hexdigest(self) -> str:
+        return self.sha256.hexdigest()
+
+def _is_expired(record: IdempotencyKey) -> bool:
+    # رکورد processing قدیمی متعلق به درخواستی است که هرگز تمام نشده
+    ttl = settings.IDEMPOTENCY_KEY_TTL if record.status == "completed" else settings.IDEMPOTENCY_PROCESSING_TTL
+    return record.created_at < datetime.utcnow() - timedelta(seconds=ttl)
+
+def claim_idempotency_key(key: str, request_path: str) -> Optional[IdempotencyKey]:
+    """
+    Reserve a key for the current request.
+    Returns None if the caller now owns the key, otherwise the existing record.
+    """
+    db = SessionLocal()
+    try:
+        record = db.query(IdempotencyKey).filter(IdempotencyKey.key == key).first()
+        if record and _is_expired(record):
+            db.delete(record)
+            db.commit()
+            record = None
+        if record:
+            db.expunge(record)
+            return record
+
+        db.add(IdempotencyKey(key=key, request_path=request_path, status="processing"))
+        try:
+            db.commit()
+            return None
+        except IntegrityError:
+            # درخواست همزمان دیگری همین کلید را ثبت کرده است
+            db.rollback()
+            record = db.query(IdempotencyKey).filter(IdempotencyKey.key == key).first()
+            if record:
+                db.expunge(record)
+            return record
+    finally:
+        db.close()
+
+def get_idempotency_key(key: str) -> Optional[IdempotencyKey]:
+    db = SessionLocal()
+    try:
+        record = db.query(IdempotencyKey).filter(IdempotencyKey.key == key).first()
+        if record:
+            db.expunge(record)
+        return record
+    finally:
+        db.close()
+
+def complete_idempotency_key(key: str, status_code: int, response_body: str, fingerprint: str):
+    """
+    Store the finished response so duplicates of the request can replay it.
+    """
+    db = SessionLocal()
+    try:
+        db.query(IdempotencyKey).filter(IdempotencyKey.key == key).update({
+            IdempotencyKey.status: "completed",
+            IdempotencyKey.status_code: status_code,
+            IdempotencyKey.response_body: response_body,
+            IdempotencyKey.fingerprint: fingerprint
+        })
+        db.commit()
+    finally:
+        db.close()
+
+def release_idempotency_key(key: str):
+    """
+    Forget a key whose request failed, so the client can retry it.
+    """
+    db = SessionLocal()
+    try:
+        db.query(IdempotencyKey).filter(IdempotencyKey.key == key).delete()
+        db.commit()
+    finally:
+        db.close()
@@ -1,10 +1,17 @@
 # api/utils/__init__.py
 
-from .remote_redis_client import get, setex, delete, update
+from .remote_redis_client import get, setex, setex_many, delete, update
 from .connection_checker import check_database_connection, check_minio_connection
 from .minio_utils import (
     generate_presigned_url, 
     upload_file_to_minio, 
+    upload_files_to_minio,
+    create_multipart_upload,
+    upload_part_to_minio,
+    presigned_part_upload_url,
+    complete_multipart_upload,
+    abort_multipart_upload,
+    generate_presigned_post_policy,
     list_buckets, 
     is_bucket_public, 
     list_objects_in_bucket, 
@@ -17,7 +24,26 @@ from .minio_utils import (
     bucket_info,
     validate_total_size,
     validate_file_size,
+    validate_content_length,
+    upload_size_limit,
+    get_upload_size,
+    SizeLimitedStream,
     folder_path_validat,    
     convert_folder_path_to_validate_path
 )
 
+from .storage_gateway import async_storage, run_storage_io, storage_executor
+from .image_utils import render_image, render_image_set, target_size, pil_format, image_media_type, check_image_pixels, ImageTooLargeError, RASTER_IMAGE_EXTENSIONS
+from .stream_upload import StreamedUpload
+from .http_ranges import parse_range_header, if_range_matches, object_validators, ranged_object_response
+from .http_cache import cache_control_for, is_not_modified, variant_etag
+from .single_flight import SingleFlight
+from .image_transformer import ImageTransformer, image_transformer
+from .disk_lru import DiskLRU
+from .variant_cache import VariantCache, variant_cache, render_variant, render_variant_set
+from .presigned_cache import PresignedUrlCache, presigned_url_cache
+from .zip_stream import ZipMember, stream_zip, STORED_EXTENSIONS
+from .base64_stream import stream_base64_json, iter_bytes, BASE64_CHUNK_SIZE
+from .hot_cache import HotObjectCache, HotObject, hot_object_cache, fetch_hot_object
+from .chunk_cache import ChunkCache, chunk_cache
+from .shared_stream import SharedObjectStream, shared_object_stream
@@ -0,0 +1,33 @@
+# api/utils/base64_stream.py
+import base64
+import json
+from typing import AsyncIterator
+
+BASE64_CHUNK_SIZE = 768 * 1024  # مضرب 3 تا چانک‌ها بدون باقیمانده کد شوند
+
+async def iter_bytes(data: bytes, chunk_size: int = BASE64_CHUNK_SIZE):
+    """
+    Async iterator over an in-memory buffer, for sources that are already loaded.
+    """
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+async def stream_base64_json(envelope: dict, field: str, data_prefix: str, chunks: AsyncIterator[bytes]):
+    """
+    Stream `envelope` as a JSON object whose last member `field` is
+    `data_prefix` followed by the base64 of `chunks`, encoded 3 bytes at a time.
+    """
+    head = json.dumps(envelope, ensure_ascii=False)[:-1]
+    separator = ", " if envelope else ""
+    yield f'{head}{separator}{json.dumps(field)}: "{json.dumps(data_prefix)[1:-1]}'.encode("utf-8")
+
+    remainder = b""
+    async for chunk in chunks:
+        if remainder:
+            chunk = remainder + chunk
+        aligned = len(chunk) - len(chunk) % 3
+        remainder = chunk[aligned:]
+        if aligned:
+            yield base64.b64encode(chunk[:aligned])
+
+    yield base64.b64encode(remainder) + b'"}'
@@ -0,0 +1,111 @@
+# api/utils/chunk_cache.py
+import asyncio
+import hashlib
+import os
+from starlette.concurrency import run_in_threadpool
+from configs import settings
+from libs import logger
+from .disk_lru import DiskLRU
+from .single_flight import SingleFlight
+from .storage_gateway import async_storage
+
+READ_BLOCK_SIZE = 1024 * 1024  # اندازه‌ی هر قطعه‌ای که از فایل چانک خوانده و ارسال می‌شود
+
+def _digest(value: str) -> str:
+    return hashlib.sha1(value.encode()).hexdigest()
+
+def _pread_blocks(path: str, offset: int, length: int) -> list:
+    # خواندن بازه‌ای از فایل چانک بدون جابه‌جایی اشاره‌گر (از page cache سیستم‌عامل)
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        blocks = []
+        while length > 0:
+            block = os.pread(fd, min(READ_BLOCK_SIZE, length), offset)
+            if not block:
+                break
+            blocks.append(block)
+            offset += len(block)
+            length -= len(block)
+        return blocks
+    finally:
+        os.close(fd)
+
+class ChunkCache(DiskLRU):
+    """
+    Local disk read-through cache of large objects stored as fixed-size chunks
+    keyed by (bucket, key, version); a range only touches the chunks covering it.
+    """
+    def __init__(self, root: str, max_bytes: int, chunk_size: int, min_object_size: int):
+        super().__init__(root, max_bytes, name="chunk")
+        self.chunk_size = chunk_size
+        self.min_object_size = min_object_size
+        self._flight = SingleFlight("chunk")
+        self._writes = set()  # نوشتن‌های در حال اجرای پس‌زمینه
+
+    def cacheable(self, size: int) -> bool:
+        return size >= self.min_object_size
+
+    def _object_dir(self, bucket_name: str, object_name: str) -> str:
+        return os.path.join(self.root, _digest(f"{bucket_name}/{object_name}"))
+
+    def _chunk_path(self, bucket_name: str, object_name: str, version_key: str, index: int) -> str:
+        return os.path.join(self._object_dir(bucket_name, object_name), _digest(str(version_key))[:16], str(index))
+
+    async def _fill_chunk(self, path: str, bucket_name: str, object_name: str, version_id: str, start: int, length: int) -> bytes:
+        response = await async_storage.get_object(bucket_name, object_name, version_id=version_id, offset=start, length=length)
+        data = await async_storage.read(response)
+        if len(data) == length:
+            # نوشتن (با fsync) روی دیسک در پس‌زمینه انجام می‌شود تا پاسخ منتظر آن نماند
+            task = asyncio.ensure_future(run_in_threadpool(self.write, path, data))
+            self._writes.add(task)
+            task.add_done_callback(self._write_done)
+        return data
+
+    def _write_done(self, task: asyncio.Future):
+        self._writes.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.warning(f"Failed to store cache chunk: {task.exception()}")
+
+    async def iter_range(
+        self, bucket_name: str, object_name: str, version_id: str, version_key: str,
+        size: int, offset: int, length: int,
+    ):
+        """
+        Async iterator over `length` bytes at `offset`, read from cached chunks and
+        filling missing chunks from MinIO.
+        """
+        end = offset + length
+        for index in range(offset // self.chunk_size, (end - 1) // self.chunk_size + 1):
+            chunk_start = index * self.chunk_size
+            chunk_length = min(self.chunk_size, size - chunk_start)
+            slice_start = max(offset, chunk_start) - chunk_start
+            slice_end = min(end, chunk_start + chunk_length) - chunk_start
+            path = self._chunk_path(bucket_name, object_name, version_key, index)
+
+            if await run_in_threadpool(self.lookup, path, chunk_length):
+                try:
+                    for block in await run_in_threadpool(_pread_blocks, path, slice_start, slice_end - slice_start):
+                        yield block
+                    continue
+                except FileNotFoundError:
+                    # بین lookup و خواندن evict شده است
+                    pass
+
+            # درخواست‌های همزمان برای یک چانک فقط یک GET به MinIO می‌زنند
+            data = await self._flight.do(
+                path, self._fill_chunk, path, bucket_name, object_name, version_id, chunk_start, chunk_length
+            )
+            yield data[slice_start:slice_end]
+
+    def invalidate(self, bucket_name: str, object_name: str):
+        """
+        Drop every cached chunk of every version of an object.
+        """
+        self.remove_tree(self._object_dir(bucket_name, object_name))
+
+chunk_cache = ChunkCache(
+    settings.CHUNK_CACHE_DIR,
+    settings.CHUNK_CACHE_MAX_BYTES,
+    settings.CHUNK_CACHE_CHUNK_SIZE,
+    settings.CHUNK_CACHE_MIN_OBJECT_SIZE,
+)
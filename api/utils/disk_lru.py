@@ -0,0 +1,165 @@
+# api/utils/disk_lru.py
+import fcntl
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Optional
+from uuid import uuid4
+from libs import CACHE_REQUESTS, CACHE_BYTES
+
+STALE_TMP_SECONDS = 3600  # فایل موقت قدیمی‌تر از این، باقی‌مانده‌ی نوشتنی است که هرگز تمام نشده
+EVICT_LOW_WATER = 0.9  # پس از evict حجم به این نسبت از سقف می‌رسد تا اسکن پوشه پشت سر هم تکرار نشود
+
+class DiskLRU:
+    """
+    Size-bounded LRU over the files under a directory, shared by every worker process.
+    Files are written to a temp name, fsynced and renamed, so neither readers nor a crash leave a partial entry.
+    The total size is a counter file guarded by an flock; once it passes max_bytes the
+    directory is re-scanned and the least recently used files (by mtime, refreshed on
+    every hit) are removed, so the budget holds for all workers together.
+    """
+    def __init__(self, root: str, max_bytes: int, name: str):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.name = name
+        os.makedirs(root, exist_ok=True)
+        self._lock_path = os.path.join(root, ".lock")
+        self._size_path = os.path.join(root, ".size")
+        with self._shared_lock():
+            self._store_size(self._scan_and_evict(self.max_bytes))
+
+    @contextmanager
+    def _shared_lock(self):
+        # هر فراخوانی fd جداگانه باز می‌کند تا flock بین threadهای یک پروسس هم انحصاری باشد
+        fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _load_size(self) -> int:
+        # باید با قفل گرفته‌شده صدا زده شود
+        try:
+            with open(self._size_path) as f:
+                return int(f.read() or 0)
+        except (FileNotFoundError, ValueError):
+            return self._scan_and_evict(self.max_bytes)
+
+    def _store_size(self, size: int):
+        # باید با قفل گرفته‌شده صدا زده شود
+        size = max(size, 0)
+        with open(self._size_path, "w") as f:
+            f.write(str(size))
+        CACHE_BYTES.labels(self.name).set(size)
+
+    def _scan_and_evict(self, limit: int) -> int:
+        # باید با قفل گرفته‌شده صدا زده شود؛ حجم واقعی پوشه را برمی‌گرداند و قدیمی‌ترین فایل‌ها را تا زیر limit حذف می‌کند
+        found = []
+        stale_before = time.time() - STALE_TMP_SECONDS
+        for dirpath, _, names in os.walk(self.root):
+            for name in names:
+                if name.startswith("."):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                    if name.endswith(".tmp"):
+                        # فایل موقت worker دیگری که هنوز در حال نوشتن است دست نمی‌خورد
+                        if stat.st_mtime < stale_before:
+                            os.remove(path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                found.append((stat.st_mtime, path, stat.st_size))
+
+        total = sum(size for _, _, size in found)
+        if total > limit:
+            for _, path, size in sorted(found):
+                if total <= limit:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+        return total
+
+    def _add(self, delta: int):
+        with self._shared_lock():
+            size = self._load_size() + delta
+            if size > self.max_bytes:
+                size = self._scan_and_evict(int(self.max_bytes * EVICT_LOW_WATER))
+            self._store_size(size)
+
+    def lookup(self, path: str, expected_size: int = None) -> bool:
+        """
+        Whether a complete entry exists at `path`; marks it as recently used.
+        """
+        try:
+            size = os.stat(path).st_size
+        except FileNotFoundError:
+            size = None
+        hit = size is not None and (expected_size is None or size == expected_size)
+        if hit:
+            try:
+                # mtime ترتیب LRU مشترک بین همه‌ی worker‌هاست
+                os.utime(path)
+            except FileNotFoundError:
+                hit = False
+        CACHE_REQUESTS.labels(self.name, "hit" if hit else "miss").inc()
+        return hit
+
+    def read(self, path: str) -> Optional[bytes]:
+        if not self.lookup(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, path: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        # نوشتن در فایل موقت و جایگزینی اتمیک تا خواننده‌ها یا پس از crash فایل نیمه‌کاره دیده نشود
+        tmp_path = f"{path}.{uuid4().hex}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+                f.flush()
+                # بدون fsync، پس از قطع برق فایل تغییرنام‌یافته ممکن است طول درست ولی داده‌ی نانوشته داشته باشد
+                os.fsync(f.fileno())
+            try:
+                previous = os.stat(path).st_size
+            except FileNotFoundError:
+                previous = 0
+            os.replace(tmp_path, path)
+        except FileNotFoundError:
+            # پوشه همزمان invalidate شده است؛ این ورودی فقط کش نمی‌شود
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            return
+        self._add(len(data) - previous)
+
+    def remove_tree(self, directory: str):
+        """
+        Drop every entry under a directory.
+        """
+        with self._shared_lock():
+            removed = 0
+            for dirpath, _, names in os.walk(directory):
+                for name in names:
+                    if name.endswith(".tmp"):
+                        continue
+                    try:
+                        removed += os.stat(os.path.join(dirpath, name)).st_size
+                    except FileNotFoundError:
+                        pass
+            shutil.rmtree(directory, ignore_errors=True)
+            if removed:
+                self._store_size(self._load_size() - removed)
@@ -0,0 +1,105 @@
+# api/utils/hot_cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from configs import settings
+from libs import CACHE_REQUESTS, CACHE_BYTES
+from .single_flight import SingleFlight
+from .storage_gateway import async_storage
+
+class HotObject(NamedTuple):
+    stat: object  # خروجی stat_object در زمان پر شدن کش
+    data: bytes
+    expires_at: Optional[float]  # None برای نسخه‌های ثابت (version_id مشخص)
+
+class HotObjectCache:
+    """
+    In-memory LRU of small objects keyed by (bucket, key, version_id), bounded by total bytes.
+    Entries for the latest version expire after `ttl` so other replicas' writes are picked up.
+    """
+    def __init__(self, max_bytes: int, max_object_size: int, ttl: int, name: str = "hot_object"):
+        self.max_bytes = max_bytes
+        self.max_object_size = max_object_size
+        self.ttl = ttl
+        self.name = name
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self._generation = 0  # با هر invalidate افزایش می‌یابد تا پرشدن‌های هم‌زمان کنار گذاشته شوند
+
+    def cacheable(self, size: int) -> bool:
+        return size <= self.max_object_size
+
+    def get(self, bucket_name: str, object_name: str, version_id: str = None) -> Optional[HotObject]:
+        key = (bucket_name, object_name, version_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at is not None and entry.expires_at < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        CACHE_REQUESTS.labels(self.name, "hit" if entry else "miss").inc()
+        return entry
+
+    def generation(self) -> int:
+        """
+        Current invalidation generation; read it before fetching an object to put.
+        """
+        with self._lock:
+            return self._generation
+
+    def put(self, bucket_name: str, object_name: str, version_id: str, stat, data: bytes, generation: int = None):
+        """
+        Cache an object; skipped if an invalidation ran since `generation` was read.
+        """
+        if not self.cacheable(len(data)):
+            return
+        key = (bucket_name, object_name, version_id)
+        expires_at = None if version_id else time.monotonic() + self.ttl
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._remove(key)
+            self._entries[key] = HotObject(stat, data, expires_at)
+            self._size += len(data)
+            while self._size > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+            CACHE_BYTES.labels(self.name).set(self._size)
+
+    def invalidate(self, bucket_name: str, object_name: str):
+        """
+        Drop every cached version of an object.
+        """
+        with self._lock:
+            self._generation += 1
+            for key in [key for key in self._entries if key[:2] == (bucket_name, object_name)]:
+                self._remove(key)
+            CACHE_BYTES.labels(self.name).set(self._size)
+
+    def _remove(self, key):
+        # باید با قفل گرفته‌شده صدا زده شود
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry.data)
+
+hot_object_cache = HotObjectCache(settings.HOT_CACHE_MAX_BYTES, settings.HOT_CACHE_MAX_OBJECT_SIZE, settings.HOT_CACHE_TTL)
+hot_object_flight = SingleFlight("hot_object")
+
+async def _load_hot_object(bucket_name: str, object_name: str, version_id: str, stat) -> bytes:
+    # اگر در حین خواندن، جایگزینی یا حذفی کش را invalidate کند، بایت‌های قدیمی در کش گذاشته نمی‌شوند
+    generation = hot_object_cache.generation()
+    response = await async_storage.get_object(bucket_name, object_name, version_id=version_id)
+    data = await async_storage.read(response)
+    hot_object_cache.put(bucket_name, object_name, version_id, stat, data, generation)
+    return data
+
+async def fetch_hot_object(bucket_name: str, object_name: str, version_id: str, stat) -> bytes:
+    """
+    Read a small object and add it to the hot cache; concurrent misses share one GET.
+    """
+    return await hot_object_flight.do(
+        (bucket_name, object_name, version_id, stat.etag),
+        _load_hot_object, bucket_name, object_name, version_id, stat,
+    )
@@ -0,0 +1,42 @@
+# api/utils/http_cache.py
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from configs import settings
+
+def cache_control_for(bucket_name: str, versioned: bool = False) -> str:
+    """
+    Cache-Control value for a download; pinned versions never change.
+    """
+    if versioned:
+        return settings.IMMUTABLE_CACHE_CONTROL
+    return settings.BUCKET_CACHE_POLICIES.get(bucket_name, settings.DEFAULT_CACHE_CONTROL)
+
+def _opaque_tag(tag: str) -> str:
+    # مقایسه‌ی ضعیف: پیشوند W/ در If-None-Match نادیده گرفته می‌شود
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+def is_not_modified(request_headers, etag: str, last_modified: datetime) -> bool:
+    """
+    Evaluate If-None-Match / If-Modified-Since; If-None-Match takes precedence.
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match:
+        if if_none_match.strip() == "*":
+            return True
+        return _opaque_tag(etag) in {_opaque_tag(tag) for tag in if_none_match.split(",")}
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            return last_modified.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def variant_etag(etag: str, *parts) -> str:
+    """
+    ETag of a transformed representation (e.g. a resized image) of an object.
+    """
+    suffix = "-".join(str(part) for part in parts if part is not None)
+    return f'"{etag.strip(chr(34))}-{suffix}"' if suffix else etag
@@ -0,0 +1,166 @@
+# api/utils/http_ranges.py
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import List, Optional, Tuple
+from urllib.parse import quote
+from uuid import uuid4
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from minio.error import S3Error
+from .storage_gateway import async_storage
+
+MAX_RANGES = 16  # بیش از این تعداد بازه نادیده گرفته می‌شود و کل فایل ارسال می‌شود
+
+def parse_range_header(range_header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parse a `bytes=` Range header into sorted, merged, inclusive (start, end) pairs.
+    Returns None when the header is absent or malformed (serve the whole object)
+    and raises 416 when no range overlaps the object.
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+
+    ranges = []
+    for spec in range_header[len("bytes="):].split(","):
+        spec = spec.strip()
+        if "-" not in spec:
+            return None
+        first, last = spec.split("-", 1)
+        if first == "":
+            # بازه‌ی پسوندی: n بایت آخر
+            if not last.isdigit():
+                return None
+            if int(last) == 0:
+                continue
+            start, end = max(0, size - int(last)), size - 1
+        else:
+            if not first.isdigit() or (last and not last.isdigit()):
+                return None
+            start = int(first)
+            if last and int(last) < start:
+                return None
+            if start >= size:
+                # شروع بعد از انتهای فایل: بازه‌ی غیرقابل ارضا
+                continue
+            end = min(int(last), size - 1) if last else size - 1
+        ranges.append((start, end))
+
+    if not ranges:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        if start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def if_range_matches(if_range: str, etag: str, last_modified: datetime) -> bool:
+    """
+    Whether an If-Range validator still matches the object (strong comparison).
+    """
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == etag
+    try:
+        return parsedate_to_datetime(if_range) == last_modified.replace(microsecond=0)
+    except (TypeError, ValueError):
+        return False
+
+def object_validators(stat) -> dict:
+    """
+    ETag and Last-Modified headers of an object from its stat.
+    """
+    return {
+        "ETag": f'"{stat.etag}"',
+        "Last-Modified": format_datetime(stat.last_modified, usegmt=True),
+    }
+
+async def _single_chunk(chunk: bytes):
+    yield chunk
+
+async def ranged_object_response(
+    bucket_name: str,
+    object_name: str,
+    version_id: str,
+    request_headers,
+    file_name: str,
+    media_type: str = "application/octet-stream",
+    stat=None,
+    cache_control: str = None,
+    data: bytes = None,
+    reader=None,
+):
+    """
+    Stream an object honouring Range / If-Range: 200 for the whole object,
+    206 for one range and multipart/byteranges for several.
+    When `data` (the cached object body) is given, ranges are served from it;
+    `reader(offset, length)` may supply another async byte source (e.g. the chunk cache).
+    """
+    if stat is None:
+        try:
+            stat = await async_storage.stat_object(bucket_name, object_name, version_id=version_id)
+        except S3Error as e:
+            raise HTTPException(status_code=404, detail=f"MinIO error: {e.message}")
+
+    size = stat.size
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(file_name)}",
+        **object_validators(stat),
+    }
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+
+    async def open_range(offset: int, length: int):
+        if data is not None:
+            return _single_chunk(data[offset:offset + length])
+        if reader is not None:
+            return reader(offset, length)
+        response = await async_storage.get_object(bucket_name, object_name, version_id=version_id, offset=offset, length=length)
+        return async_storage.iter_object(response)
+
+    ranges = parse_range_header(request_headers.get("range"), size)
+    if ranges and not if_range_matches(request_headers.get("if-range"), headers["ETag"], stat.last_modified):
+        ranges = None
+
+    if not ranges:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(await open_range(0, size), media_type=media_type, headers=headers)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(await open_range(start, end - start + 1), status_code=206, media_type=media_type, headers=headers)
+
+    boundary = uuid4().hex
+    part_headers = [
+        f"--{boundary}\r\nContent-Type: {media_type}\r\nContent-Range: bytes {start}-{end}/{size}\r\n\r\n".encode("latin-1")
+        for start, end in ranges
+    ]
+    closing = f"--{boundary}--\r\n".encode("latin-1")
+    headers["Content-Length"] = str(
+        sum(len(part) + (end - start + 1) + 2 for part, (start, end) in zip(part_headers, ranges)) + len(closing)
+    )
+
+    async def stream_ranges():
+        for part, (start, end) in zip(part_headers, ranges):
+            yield part
+            async for chunk in await open_range(start, end - start + 1):
+                yield chunk
+            yield b"\r\n"
+        yield closing
+
+    return StreamingResponse(
+        stream_ranges(),
+        status_code=206,
+        media_type=f"multipart/byteranges; boundary={boundary}",
+        headers=headers,
+    )
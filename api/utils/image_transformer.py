@@ -0,0 +1,146 @@
+# api/utils/image_transformer.py
+import asyncio
+import signal
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from fastapi import HTTPException
+from dbs import create_minio_client
+from configs import settings
+from libs import logger
+from PIL import Image
+from .image_utils import render_image, render_image_set, ImageTooLargeError
+
+# کلاینت MinIO مخصوص هر پروسس کارگر (اتصال‌های پروسس والد پس از fork قابل اشتراک نیستند)
+_worker_client = None
+
+def _init_worker():
+    global _worker_client
+    _worker_client = create_minio_client()
+
+class JobTimeoutError(Exception):
+    pass
+
+def _on_alarm(signum, frame):
+    raise JobTimeoutError("Image job exceeded its time limit")
+
+def _run_job(timeout: float, func, *args):
+    # مهلت داخل خود پروسس کارگر اعمال می‌شود تا کار طولانی، کارگر را بیش از timeout اشغال نکند.
+    # عملیات C در Pillow قطع نمی‌شود و سیگنال پس از بازگشت به پایتون اثر می‌کند.
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return func(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def _read_object(bucket_name: str, object_name: str, version_id: str) -> bytes:
+    # داخل پروسس کارگر اجرا می‌شود تا بایت‌های تصویر اصلی بین پروسس‌ها جابه‌جا نشوند
+    response = _worker_client.get_object(bucket_name, object_name, version_id=version_id)
+    try:
+        return response.read()
+    finally:
+        response.close()
+        response.release_conn()
+
+def _render_object(bucket_name: str, object_name: str, version_id: str, width: int, height: int, extension: str) -> bytes:
+    return render_image(_read_object(bucket_name, object_name, version_id), width, height, extension)
+
+def _render_object_set(bucket_name: str, object_name: str, version_id: str, widths: list, extensions: list) -> list:
+    return render_image_set(_read_object(bucket_name, object_name, version_id), widths, extensions)
+
+class ImageTransformer:
+    """
+    Image resize/convert engine on a process pool with a bounded queue and per-job timeouts.
+    The timeout is enforced twice: the caller stops waiting, and the worker interrupts
+    the job with SIGALRM so its process and queue slot are freed as well.
+    """
+    def __init__(self, workers: int, queue_size: int, timeout: int):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        # پروسس‌ها در اولین استفاده ساخته می‌شوند، نه هنگام import
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+            return self._pool
+
+    def _submit(self, timeout: float, func, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            raise HTTPException(status_code=503, detail="Image processing queue is full", headers={"Retry-After": "1"})
+        try:
+            future = self._executor().submit(_run_job, timeout, func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _timed_out(self, future: Future, timeout: float):
+        # کار در صف لغو می‌شود؛ کار در حال اجرا را مهلت داخل کارگر (_run_job) متوقف می‌کند
+        future.cancel()
+        logger.error(f"Image job exceeded {timeout}s")
+        return HTTPException(status_code=504, detail="Image processing timed out")
+
+    def transform(self, data: bytes, width: int = None, height: int = None, extension: str = None) -> bytes:
+        """
+        Resize/convert encoded image bytes; blocks the calling (worker) thread.
+        """
+        future = self._submit(self.timeout, render_image, data, width, height, extension)
+        try:
+            return future.result(timeout=self.timeout)
+        except (FutureTimeoutError, JobTimeoutError):
+            raise self._timed_out(future, self.timeout)
+        except (ImageTooLargeError, Image.DecompressionBombError) as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+    async def _await(self, future: Future, timeout: float):
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+        except (asyncio.TimeoutError, JobTimeoutError):
+            raise self._timed_out(future, timeout)
+        except (ImageTooLargeError, Image.DecompressionBombError) as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+    async def transform_async(self, data: bytes, width: int = None, height: int = None, extension: str = None) -> bytes:
+        """
+        Resize/convert encoded image bytes without blocking the event loop.
+        """
+        return await self._await(self._submit(self.timeout, render_image, data, width, height, extension), self.timeout)
+
+    async def transform_object(
+        self, bucket_name: str, object_name: str, version_id: str = None,
+        width: int = None, height: int = None, extension: str = None,
+    ) -> bytes:
+        """
+        Resize/convert a stored object; the worker reads it from MinIO itself.
+        """
+        return await self._await(
+            self._submit(self.timeout, _render_object, bucket_name, object_name, version_id, width, height, extension),
+            self.timeout
+        )
+
+    async def transform_set_object(
+        self, bucket_name: str, object_name: str, version_id: str, widths: list, extensions: list,
+    ) -> list:
+        """
+        Render several widths/formats of a stored image from a single decode.
+        The job gets one timeout per variant, since each variant is a separate resize/encode.
+        """
+        timeout = self.timeout * max(1, len(widths) * len(extensions))
+        return await self._await(
+            self._submit(timeout, _render_object_set, bucket_name, object_name, version_id, list(widths), list(extensions)),
+            timeout
+        )
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+image_transformer = ImageTransformer(settings.IMAGE_WORKERS, settings.IMAGE_QUEUE_SIZE, settings.IMAGE_JOB_TIMEOUT)
@@ -0,0 +1,113 @@
+# api/utils/image_utils.py
+from io import BytesIO
+from typing import List, Tuple
+from PIL import Image
+from configs import settings
+
+# محافظ خود PIL در برابر decompression bomb هم با همین سقف هماهنگ می‌شود
+Image.MAX_IMAGE_PIXELS = settings.IMAGE_MAX_PIXELS
+
+class ImageTooLargeError(ValueError):
+    pass
+
+# پسوندهایی که PIL می‌تواند باز کند و دوباره ذخیره کند
+RASTER_IMAGE_EXTENSIONS = ["jpg", "jpeg", "png", "gif", "bmp", "tiff", "webp"]
+
+def pil_format(extension: str) -> str:
+    """
+    PIL format name of a file extension (e.g. jpg -> JPEG).
+    """
+    return Image.registered_extensions().get(f".{extension.lower()}", extension.upper())
+
+def target_size(original_width: int, original_height: int, width: int = None, height: int = None):
+    """
+    Output size for a resize request; a single dimension keeps the aspect ratio.
+    """
+    if width and height:
+        return width, height
+    if width:
+        return width, max(1, int((width / original_width) * original_height))
+    if height:
+        return max(1, int((height / original_height) * original_width)), height
+    return original_width, original_height
+
+def check_image_pixels(width: int, height: int):
+    """
+    Reject images above IMAGE_MAX_PIXELS before any pixel buffer is allocated.
+    """
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ImageTooLargeError(f"Image of {width}x{height} pixels exceeds the {settings.IMAGE_MAX_PIXELS} pixel limit")
+
+def choose_resample(scale: float):
+    """
+    Resampling filter for a scale factor: cheap filters for large reductions
+    (the image has already been box-reduced), high quality for small ones.
+    """
+    if scale > 1:
+        return Image.BICUBIC
+    if scale >= 0.5:
+        return Image.LANCZOS
+    return Image.BILINEAR
+
+def render_image(data: bytes, width: int = None, height: int = None, extension: str = None) -> bytes:
+    """
+    Resize an encoded image and re-encode it in the requested (or original) format.
+    """
+    img = Image.open(BytesIO(data))  # فقط هدر خوانده می‌شود
+    check_image_pixels(*img.size)
+    image_format = pil_format(extension) if extension else img.format
+    size = target_size(*img.size, width, height)
+    check_image_pixels(*size)
+
+    # JPEG مستقیماً در مقیاس 1/2 تا 1/8 دیکد می‌شود تا تصویر کامل در حافظه ساخته نشود
+    if img.format == "JPEG" and size != img.size:
+        img.draft(None, size)
+
+    if size != img.size:
+        scale = min(size[0] / img.size[0], size[1] / img.size[1])
+        # reducing_gap ابتدا با reduce() (میانگین‌گیری بلوکی) کوچک می‌کند و بعد فیلتر انتخابی را اعمال می‌کند
+        img = img.resize(size, resample=choose_resample(scale), reducing_gap=2.0)
+
+    return encode_image(img, image_format)
+
+def encode_image(img, image_format: str) -> bytes:
+    if image_format == "JPEG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+
+    img_io = BytesIO()
+    img.save(img_io, format=image_format)
+    return img_io.getvalue()
+
+def render_image_set(data: bytes, widths: List[int], extensions: List[str]) -> List[Tuple[int, str, bytes]]:
+    """
+    Render every (width, extension) variant of an image from a single decode.
+    Levels are produced from the largest width down, each resized from the previous one.
+    """
+    img = Image.open(BytesIO(data))  # فقط هدر خوانده می‌شود
+    check_image_pixels(*img.size)
+    widths = sorted(set(widths), reverse=True)
+    sizes = {width: target_size(*img.size, width) for width in widths}
+    for size in sizes.values():
+        check_image_pixels(*size)
+
+    # دیکد فقط یک بار و در کوچک‌ترین مقیاسی که برای بزرگ‌ترین عرض کافی است
+    if img.format == "JPEG":
+        img.draft(None, sizes[widths[0]])
+    img.load()
+
+    results = []
+    level = img
+    for width in widths:
+        size = sizes[width]
+        if size != level.size:
+            scale = min(size[0] / level.size[0], size[1] / level.size[1])
+            level = level.resize(size, resample=choose_resample(scale), reducing_gap=2.0)
+        for extension in extensions:
+            results.append((width, extension, encode_image(level, pil_format(extension))))
+    return results
+
+def image_media_type(extension: str) -> str:
+    """
+    MIME type of an image extension (e.g. jpg -> image/jpeg).
+    """
+    return Image.MIME.get(pil_format(extension), f"image/{extension.lower()}")
@@ -1,11 +1,17 @@
 from io import BytesIO
 from minio.error import S3Error
+from minio.datatypes import Part, PostPolicy
+from datetime import datetime, timedelta
 from dbs import minio_client
 from configs import settings, allowed_extensions
 from starlette.status import HTTP_413_REQUEST_ENTITY_TOO_LARGE
 from fastapi import HTTPException
 from typing import List
 from fastapi import UploadFile
+from concurrent.futures import ThreadPoolExecutor
+from libs import logger, UPLOAD_BYTES, UPLOAD_THROUGHPUT
+import time
+import hashlib
 
 def stream_minio_object(minio_response, buffer_size=1024 * 1024):  # 1 MB buffer
     for chunk in minio_response.stream(buffer_size):
@@ -37,50 +43,234 @@ def create_path_if_not_exists(bucket_name: str, folder_path: str):
     except S3Error as e:
         raise Exception(f"Failed to create path: {str(e)}")
 
-def validate_file_size(upload_file):
+class SizeLimitedStream:
     """
-    Validate the uploaded file size.
+    Wrap a file object and count the bytes read from it, aborting the read
+    (and so the MinIO put that consumes it) once max_size is exceeded.
+    """
+    def __init__(self, stream, max_size: int = None, file_name: str = None):
+        self._stream = stream
+        self.max_size = max_size
+        self.file_name = file_name
+        self.bytes_read = 0
+        self.sha256 = hashlib.sha256()  # هش محتوا در همان خواندنی که put_object انجام می‌دهد
+
+    def read(self, size: int = -1):
+        data = self._stream.read(size)
+        self.bytes_read += len(data)
+        self.sha256.update(data)
+        if self.max_size is not None and self.bytes_read > self.max_size:
+            raise HTTPException(
+                status_code=HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File '{self.file_name}' exceeds the maximum allowed size of {self.max_size // (1024 * 1024)} MB"
+            )
+        return data
+
+    def remaining_size(self):
+        """
+        Bytes left in the wrapped stream, or None if it is not seekable.
+        """
+        try:
+            position = self._stream.tell()
+            end = self._stream.seek(0, 2)
+            self._stream.seek(position)
+            return end - position
+        except Exception:
+            return None
+
+def get_upload_size(upload_file: UploadFile) -> int:
+    """
+    Size of an uploaded file without reading its content (part header, then spool position).
+    """
+    size = getattr(upload_file, "size", None)
+    if size is None:
+        declared = upload_file.headers.get("content-length") if upload_file.headers else None
+        if declared and declared.isdigit():
+            return int(declared)
+        position = upload_file.file.tell()
+        upload_file.file.seek(0, 2)
+        size = upload_file.file.tell()
+        upload_file.file.seek(position)
+    return size
+
+def upload_size_limit(path: str):
     """
-    file_content = upload_file.file.read()
-    upload_file.file.seek(0)  # بازنشانی برای استفاده مجدد
+    Maximum request body allowed for an upload route, or None for other routes.
+    """
+    if path.startswith("/files/upload/multiple/"):
+        return settings.MAX_TOTAL_UPLOAD_SIZE + settings.UPLOAD_ENVELOPE_OVERHEAD
+    if path.startswith("/files/upload/"):
+        return settings.MAX_FILE_SIZE + settings.UPLOAD_ENVELOPE_OVERHEAD
+    return None
+
+def validate_content_length(content_length: str, limit: int):
+    """
+    Reject a request from its Content-Length header before the body is read.
+    """
+    if content_length and content_length.isdigit() and int(content_length) > limit:
+        raise HTTPException(
+            status_code=HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Request body exceeds the maximum allowed size of {limit // (1024 * 1024)} MB"
+        )
 
-    if len(file_content) > settings.MAX_FILE_SIZE:
+def validate_file_size(upload_file: UploadFile, max_size: int = None):
+    """
+    Validate the uploaded file size.
+    """
+    max_size = max_size or settings.MAX_FILE_SIZE
+    if get_upload_size(upload_file) > max_size:
         raise HTTPException(
             status_code=HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail=f"File '{upload_file.filename}' exceeds the maximum allowed size of {settings.MAX_FILE_SIZE // (1024 * 1024)} MB"
+            detail=f"File '{upload_file.filename}' exceeds the maximum allowed size of {max_size // (1024 * 1024)} MB"
         )
 
 def validate_total_size(files: List[UploadFile]):
-    total_size = 0
-    for file in files:
-        content = file.file.read()
-        file.file.seek(0)
-        total_size += len(content)
+    total_size = sum(get_upload_size(file) for file in files)
     if total_size > settings.MAX_TOTAL_UPLOAD_SIZE:
         raise HTTPException(
             status_code=413,
             detail=f"Total uploaded files exceed the maximum allowed size of {settings.MAX_TOTAL_UPLOAD_SIZE // 1024 // 1024} MB"
         )
       
-def upload_file_to_minio(bucket_name: str, folder_path: str, file_name: str, file_content):
+def upload_file_to_minio(bucket_name: str, folder_path: str, file_name: str, file_content, ensure_bucket: bool = True):
     try:        
-        if not minio_client.bucket_exists(bucket_name):
+        if ensure_bucket and not minio_client.bucket_exists(bucket_name):
             minio_client.make_bucket(bucket_name)
 
         object_name = f"{folder_path}/{file_name}" if folder_path != "" else file_name
-        
+
+        length = file_content.remaining_size() if hasattr(file_content, "remaining_size") else None
+        if length is None:
+            length, part_size = -1, 64 * 1024 * 1024  # Unknown length, 64 MB buffered parts
+        else:
+            part_size = choose_part_size(length)
+
+        started = time.monotonic()
         result = minio_client.put_object(
             bucket_name,
             object_name,
             file_content,
-            length=-1,  # Auto-detect length
-            part_size=64 * 1024 * 1024  # 64 MB parts
+            length=length,
+            part_size=part_size,
+            num_parallel_uploads=settings.UPLOAD_PARALLELISM
+        )
+        elapsed = max(time.monotonic() - started, 1e-6)
+
+        uploaded = getattr(file_content, "bytes_read", length)
+        UPLOAD_BYTES.labels(bucket=bucket_name).inc(uploaded)
+        UPLOAD_THROUGHPUT.observe(uploaded / elapsed)
+        logger.info(
+            f"Uploaded '{object_name}': {human_readable_size(uploaded)} in {elapsed:.2f}s "
+            f"({human_readable_size(int(uploaded / elapsed))}/s, part_size={human_readable_size(part_size)}, "
+            f"parallel={settings.UPLOAD_PARALLELISM})"
         )
 
         return result
     except S3Error as e:
         raise Exception(f"Failed to upload file: {str(e)}")
     
+def choose_part_size(length: int) -> int:
+    """
+    Part size that splits an upload into about UPLOAD_TARGET_PART_COUNT parts,
+    rounded to whole MBs and kept within the configured bounds.
+    """
+    mb = 1024 * 1024
+    part_size = -(-length // settings.UPLOAD_TARGET_PART_COUNT)
+    part_size = -(-part_size // mb) * mb
+    return max(settings.UPLOAD_MIN_PART_SIZE, min(part_size, settings.UPLOAD_MAX_PART_SIZE))
+
+def upload_files_to_minio(bucket_name: str, folder_path: str, uploads: list, max_workers: int = None) -> list:
+    """
+    Upload several (file_key, stream) pairs to MinIO in parallel with bounded concurrency.
+    Returns one entry per upload, in order: the put result, or the exception it raised.
+    """
+    if not uploads:
+        return []
+
+    workers = min(max_workers or settings.UPLOAD_CONCURRENCY, len(uploads))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(upload_file_to_minio, bucket_name, folder_path, file_key, stream, False)
+            for file_key, stream in uploads
+        ]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+def create_multipart_upload(bucket_name: str, object_name: str, content_type: str = None) -> str:
+    """
+    Start a MinIO multipart upload and return its upload id.
+    """
+    try:
+        headers = {"Content-Type": content_type or "application/octet-stream"}
+        return minio_client._create_multipart_upload(bucket_name, object_name, headers)
+    except S3Error as e:
+        raise Exception(f"Failed to create multipart upload: {str(e)}")
+
+def upload_part_to_minio(bucket_name: str, object_name: str, upload_id: str, part_number: int, data: bytes) -> str:
+    """
+    Upload one part of a multipart upload and return its etag.
+    """
+    try:
+        return minio_client._upload_part(bucket_name, object_name, data, None, upload_id, part_number)
+    except S3Error as e:
+        raise Exception(f"Failed to upload part {part_number}: {str(e)}")
+
+def presigned_part_upload_url(bucket_name: str, object_name: str, upload_id: str, part_number: int, expiry_seconds: int) -> str:
+    """
+    Presigned PUT URL for one part of a multipart upload, so the part body can be streamed.
+    """
+    try:
+        return minio_client.get_presigned_url(
+            "PUT",
+            bucket_name,
+            object_name,
+            expires=timedelta(seconds=expiry_seconds),
+            extra_query_params={"uploadId": upload_id, "partNumber": str(part_number)}
+        )
+    except S3Error as e:
+        raise Exception(f"Failed to presign part {part_number}: {str(e)}")
+
+def complete_multipart_upload(bucket_name: str, object_name: str, upload_id: str, parts: list):
+    """
+    Complete a multipart upload from (part_number, etag) pairs.
+    """
+    try:
+        return minio_client._complete_multipart_upload(
+            bucket_name,
+            object_name,
+            upload_id,
+            [Part(part_number, etag) for part_number, etag in sorted(parts)]
+        )
+    except S3Error as e:
+        raise Exception(f"Failed to complete multipart upload: {str(e)}")
+
+def abort_multipart_upload(bucket_name: str, object_name: str, upload_id: str):
+    try:
+        minio_client._abort_multipart_upload(bucket_name, object_name, upload_id)
+    except S3Error as e:
+        raise Exception(f"Failed to abort multipart upload: {str(e)}")
+
+def generate_presigned_post_policy(bucket_name: str, object_name: str, content_type: str, file_size: int, expiry_seconds: int) -> dict:
+    """
+    Generate presigned POST form fields restricted to one key, content type and size.
+    """
+    try:
+        policy = PostPolicy(bucket_name, datetime.utcnow() + timedelta(seconds=expiry_seconds))
+        policy.add_equals_condition("key", object_name)
+        policy.add_equals_condition("Content-Type", content_type)
+        policy.add_content_length_range_condition(file_size, file_size)
+        form_data = minio_client.presigned_post_policy(policy)
+        form_data["key"] = object_name
+        form_data["Content-Type"] = content_type
+        return form_data
+    except S3Error as e:
+        raise Exception(f"Failed to generate presigned POST policy: {str(e)}")
+
 def generate_presigned_url(bucket_name: str, file_name: str):
     """
     Generate a presigned URL
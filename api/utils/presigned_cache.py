@@ -0,0 +1,68 @@
+# api/utils/presigned_cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from configs import settings
+
+class PresignedUrlCache:
+    """
+    LRU of presigned GET URLs keyed by (bucket, object, version, expiry, variant);
+    an entry is reused while at least `min_remaining` of its lifetime is left.
+    """
+    def __init__(self, max_entries: int, min_remaining: float):
+        self.max_entries = max_entries
+        self.min_remaining = min_remaining
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # کلید -> (url, زمان انقضا)
+        self._by_object = {}  # (bucket, object) -> مجموعه‌ی کلیدها، برای invalidate
+
+    def get(self, bucket_name: str, object_name: str, version_id: str, expiry_seconds: int, variant: str = None) -> Optional[str]:
+        entry = self.lookup(bucket_name, object_name, version_id, expiry_seconds, variant)
+        return entry[0] if entry else None
+
+    def lookup(self, bucket_name: str, object_name: str, version_id: str, expiry_seconds: int, variant: str = None) -> Optional[Tuple[str, int]]:
+        """
+        Cached URL and the whole seconds it stays valid, or None.
+        """
+        key = (bucket_name, object_name, version_id, expiry_seconds, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            url, expires_at = entry
+            remaining = expires_at - time.monotonic()
+            if remaining < expiry_seconds * self.min_remaining:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return url, int(remaining)
+
+    def put(self, bucket_name: str, object_name: str, version_id: str, expiry_seconds: int, url: str, variant: str = None):
+        key = (bucket_name, object_name, version_id, expiry_seconds, variant)
+        with self._lock:
+            # لینک درست قبل از put امضا شده؛ اختلاف کوچک زمانی با حاشیه‌ی min_remaining پوشش داده می‌شود
+            self._entries[key] = (url, time.monotonic() + expiry_seconds)
+            self._entries.move_to_end(key)
+            self._by_object.setdefault((bucket_name, object_name), set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, bucket_name: str, object_name: str):
+        """
+        Forget every URL signed for an object (after it is replaced or deleted).
+        """
+        with self._lock:
+            for key in list(self._by_object.get((bucket_name, object_name), ())):
+                self._remove(key)
+
+    def _remove(self, key):
+        # باید با قفل گرفته‌شده صدا زده شود
+        self._entries.pop(key, None)
+        keys = self._by_object.get(key[:2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_object[key[:2]]
+
+presigned_url_cache = PresignedUrlCache(settings.PRESIGNED_CACHE_MAX_ENTRIES, settings.PRESIGNED_CACHE_MIN_REMAINING)
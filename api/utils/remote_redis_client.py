@@ -1,12 +1,35 @@
 # api/utils/remote_redis_client.py
+import asyncio
 import httpx
+from typing import List, Tuple
 from fastapi import HTTPException
+from redis.asyncio import Redis
 from configs import settings
+from libs import logger
 
 REDIS_API_BASE = settings.REDIS_API_BASE
 API_KEY = settings.API_KEY
 DB_INDEX = settings.REDIS_DB_INDEX
 
+PROXY_BATCH_CONCURRENCY = 20  # حداکثر درخواست همزمان به پروکسی در نوشتن دسته‌ای
+
+# اتصال مستقیم به Redis فقط برای نوشتن دسته‌ای (pipeline)؛ پروکسی HTTP اندپوینت دسته‌ای ندارد.
+# فقط وقتی REDIS_HOST تنظیم شده باشد استفاده می‌شود و کلیدها را بدون پیشوند در همان DB پروکسی می‌نویسد.
+_direct_client = None
+
+def direct_client():
+    global _direct_client
+    if _direct_client is None:
+        if not settings.REDIS_HOST:
+            return None
+        _direct_client = Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            password=settings.REDIS_PASSWORD,
+            db=DB_INDEX
+        )
+    return _direct_client
+
 async def setex(key: str, ttl: int, value: str):
     # یک درخواست POST به /create می‌فرستیم
     data = {
@@ -79,4 +102,47 @@ async def update(key: str, ttl: int, value: str):
         raise HTTPException(status_code=500, detail="Failed to store data in Redis")
     except Exception as e:
         print("Unexpected Error:", str(e))
-        raise HTTPException(status_code=500, detail="Unexpected error occurred")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Unexpected error occurred")
+
+async def _proxy_setex_many(items: List[Tuple[str, int, str]]) -> list:
+    # بدون اتصال مستقیم: همان /create پروکسی، به‌صورت همزمان روی یک کلاینت مشترک
+    headers = {
+        "x-api-key": API_KEY,
+        "Content-Type": "application/json"
+    }
+    limits = httpx.Limits(max_connections=PROXY_BATCH_CONCURRENCY)
+    async with httpx.AsyncClient(limits=limits) as client:
+        async def create(key: str, ttl: int, value: str):
+            data = {
+                "key": key,
+                "value": str(value),
+                "db_index": DB_INDEX,
+                "ttl": ttl
+            }
+            response = await client.post(f"{REDIS_API_BASE}/create", json=data, headers=headers)
+            response.raise_for_status()
+
+        results = await asyncio.gather(*(create(key, ttl, value) for key, ttl, value in items), return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"Failed to store data in Redis through the proxy: {result}")
+    return [result if isinstance(result, Exception) else None for result in results]
+
+async def setex_many(items: List[Tuple[str, int, str]]) -> list:
+    """
+    Store many (key, ttl, value) entries, pipelined over a direct Redis connection when
+    REDIS_HOST is configured and through the HTTP proxy otherwise.
+    Values are stored as str(value), like the proxy's /create; returns one error (or None) per item.
+    """
+    client = direct_client()
+    if client is None:
+        return await _proxy_setex_many(items)
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            for key, ttl, value in items:
+                pipe.setex(key, ttl, str(value))
+            results = await pipe.execute(raise_on_error=False)
+    except Exception as e:
+        logger.warning(f"Direct Redis pipeline failed, falling back to the proxy: {e}")
+        return await _proxy_setex_many(items)
+    return [result if isinstance(result, Exception) else None for result in results]
@@ -0,0 +1,102 @@
+# api/utils/shared_stream.py
+import asyncio
+from typing import Dict, Hashable
+from configs import settings
+from libs import logger, COALESCED_REQUESTS
+from .storage_gateway import async_storage
+
+class _Broadcast:
+    def __init__(self, size: int):
+        self.size = size
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.changed = asyncio.Event()
+        self.task = None
+
+    def notify(self):
+        # رویداد فعلی بیدار و رویداد تازه برای انتظار بعدی ساخته می‌شود
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+class SharedObjectStream:
+    """
+    Coalesce concurrent whole-object downloads: the first request opens one MinIO GET
+    whose chunks are buffered, and every identical request replays that buffer from the
+    start while it fills. The buffer is bounded by `max_object_size` per object and
+    `max_bytes` in total; a follower waits at most `timeout` for each next chunk.
+    """
+    def __init__(self, name: str, max_object_size: int, max_bytes: int, timeout: int):
+        self.name = name
+        self.max_object_size = max_object_size
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._streams: Dict[Hashable, _Broadcast] = {}
+        self._reserved = 0
+
+    async def _produce(self, key: Hashable, broadcast: _Broadcast, bucket_name: str, object_name: str, version_id: str):
+        try:
+            response = await async_storage.get_object(bucket_name, object_name, version_id=version_id)
+            async for chunk in async_storage.iter_object(response):
+                broadcast.chunks.append(chunk)
+                broadcast.notify()
+        except Exception as e:
+            logger.error(f"[shared-stream] failed to read {bucket_name}/{object_name}: {e}")
+            broadcast.error = e
+        finally:
+            broadcast.done = True
+            broadcast.notify()
+            if self._streams.get(key) is broadcast:
+                del self._streams[key]
+            self._reserved -= broadcast.size
+
+    def _join(self, bucket_name: str, object_name: str, version_id: str, stat):
+        key = (bucket_name, object_name, version_id, stat.etag)
+        broadcast = self._streams.get(key)
+        if broadcast is not None:
+            COALESCED_REQUESTS.labels(self.name).inc()
+            return broadcast
+        if stat.size > self.max_object_size or self._reserved + stat.size > self.max_bytes:
+            # بافر مشترک پر است؛ این درخواست بدون ادغام مستقیم از MinIO خوانده می‌شود
+            return None
+        broadcast = _Broadcast(stat.size)
+        self._streams[key] = broadcast
+        self._reserved += stat.size
+        # خواندن در task جداگانه اجرا می‌شود تا قطع اتصال اولین درخواست آن را برای بقیه لغو نکند
+        broadcast.task = asyncio.ensure_future(self._produce(key, broadcast, bucket_name, object_name, version_id))
+        return broadcast
+
+    async def iter_range(self, bucket_name: str, object_name: str, version_id: str, stat, offset: int, length: int):
+        """
+        Async iterator over `length` bytes at `offset`; whole-object reads share one
+        MinIO GET, partial ranges are read directly.
+        """
+        broadcast = None
+        if offset == 0 and length == stat.size:
+            broadcast = self._join(bucket_name, object_name, version_id, stat)
+        if broadcast is None:
+            response = await async_storage.get_object(bucket_name, object_name, version_id=version_id, offset=offset, length=length)
+            async for chunk in async_storage.iter_object(response):
+                yield chunk
+            return
+
+        index = 0
+        while True:
+            while index < len(broadcast.chunks):
+                yield broadcast.chunks[index]
+                index += 1
+            if broadcast.done:
+                if broadcast.error is not None:
+                    raise broadcast.error
+                return
+            try:
+                await asyncio.wait_for(broadcast.changed.wait(), self.timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"Timed out waiting for {bucket_name}/{object_name} from a shared download")
+
+shared_object_stream = SharedObjectStream(
+    "shared_stream",
+    settings.CHUNK_CACHE_MIN_OBJECT_SIZE,
+    settings.SHARED_STREAM_MAX_BYTES,
+    settings.SINGLE_FLIGHT_TIMEOUT,
+)
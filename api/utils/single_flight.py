@@ -0,0 +1,42 @@
+# api/utils/single_flight.py
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable
+from fastapi import HTTPException
+from configs import settings
+from libs import COALESCED_REQUESTS
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key: the first caller starts the work,
+    followers await the same result. The work runs in its own task so a disconnecting
+    leader does not cancel it for everyone else.
+    """
+    def __init__(self, name: str, max_keys: int = settings.SINGLE_FLIGHT_MAX_KEYS, timeout: int = settings.SINGLE_FLIGHT_TIMEOUT):
+        self.name = name
+        self.max_keys = max_keys
+        self.timeout = timeout
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable], *args, **kwargs):
+        task = self._calls.get(key)
+        leader = task is None
+        if leader:
+            if len(self._calls) >= self.max_keys:
+                # بیش از حد کلید همزمان؛ بدون ادغام اجرا می‌شود تا حافظه محدود بماند
+                return await func(*args, **kwargs)
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            COALESCED_REQUESTS.labels(self.name).inc()
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), None if leader else self.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Timed out waiting for an identical in-flight request")
+
+    def _finish(self, key: Hashable, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # جلوگیری از هشدار «exception was never retrieved»
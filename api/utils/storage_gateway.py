@@ -0,0 +1,93 @@
+# api/utils/storage_gateway.py
+import asyncio
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from dbs import minio_client
+from configs import settings
+from .minio_utils import does_path_exist, list_objects_in_bucket, presigned_part_upload_url
+
+# اجراکننده اختصاصی برای عملیات I/O روی MinIO تا event loop مسدود نشود
+storage_executor = ThreadPoolExecutor(max_workers=settings.STORAGE_IO_WORKERS, thread_name_prefix="storage-io")
+
+async def run_storage_io(func, *args, **kwargs):
+    """
+    Run a blocking storage call on the storage I/O executor.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(storage_executor, partial(func, *args, **kwargs))
+
+def _release(response):
+    response.close()
+    response.release_conn()
+
+def _read_all(response) -> bytes:
+    try:
+        return response.read()
+    finally:
+        _release(response)
+
+class AsyncStorage:
+    """
+    Async facade over the blocking MinIO client used by the async routes.
+    """
+    def __init__(self, client):
+        self._client = client
+
+    async def bucket_exists(self, bucket_name: str) -> bool:
+        return await run_storage_io(self._client.bucket_exists, bucket_name)
+
+    async def path_exists(self, bucket_name: str, folder_path: str) -> bool:
+        return await run_storage_io(does_path_exist, bucket_name, folder_path)
+
+    async def list_objects(self, bucket_name: str, folder_path: str) -> list:
+        return await run_storage_io(list_objects_in_bucket, bucket_name, folder_path)
+
+    async def stat_object(self, bucket_name: str, object_name: str, version_id: str = None):
+        return await run_storage_io(self._client.stat_object, bucket_name, object_name, version_id=version_id)
+
+    async def get_object(self, bucket_name: str, object_name: str, version_id: str = None, offset: int = 0, length: int = 0):
+        return await run_storage_io(
+            self._client.get_object, bucket_name, object_name, offset=offset, length=length, version_id=version_id
+        )
+
+    async def presigned_get_object(self, bucket_name: str, object_name: str, expires, version_id: str = None, response_headers: dict = None) -> str:
+        return await run_storage_io(
+            self._client.presigned_get_object, bucket_name, object_name,
+            expires=expires, version_id=version_id, response_headers=response_headers
+        )
+
+    async def upload_part_stream(self, bucket_name: str, object_name: str, upload_id: str, part_number: int, chunks, length: int) -> str:
+        """
+        Stream one multipart part from an async iterator straight to MinIO and return its etag.
+        The part is sent with a fixed Content-Length, so it is never held in memory whole.
+        """
+        url = await run_storage_io(
+            presigned_part_upload_url, bucket_name, object_name, upload_id, part_number, settings.MULTIPART_PART_UPLOAD_TIMEOUT
+        )
+        async with httpx.AsyncClient(timeout=settings.MULTIPART_PART_UPLOAD_TIMEOUT) as client:
+            response = await client.put(url, content=chunks, headers={"Content-Length": str(length)})
+        if response.status_code != 200:
+            raise Exception(f"Failed to upload part {part_number}: {response.status_code} {response.text[:200]}")
+        return response.headers.get("etag", "").replace('"', "")
+
+    async def read(self, response) -> bytes:
+        """
+        Read a whole object body and release its connection.
+        """
+        return await run_storage_io(_read_all, response)
+
+    async def iter_object(self, response, chunk_size: int = 1024 * 1024):
+        """
+        Async iterator over an object body; the connection is released when done.
+        """
+        try:
+            while True:
+                chunk = await run_storage_io(response.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            await run_storage_io(_release, response)
+
+async_storage = AsyncStorage(minio_client)
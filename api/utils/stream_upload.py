@@ -0,0 +1,197 @@
+# api/utils/stream_upload.py
+import asyncio
+import hashlib
+from mimetypes import guess_type
+from multipart.multipart import MultipartParser, parse_options_header
+from fastapi import HTTPException
+from starlette.status import HTTP_413_REQUEST_ENTITY_TOO_LARGE
+from configs import settings, allowed_extensions
+from .minio_utils import create_multipart_upload, upload_part_to_minio, complete_multipart_upload, abort_multipart_upload
+from .storage_gateway import run_storage_io
+
+MAX_FIELD_SIZE = 64 * 1024  # 64 KB برای فیلدهای غیر فایل
+
+class StreamedUpload:
+    """
+    Parse a multipart/form-data body as it arrives and pipe its file part
+    straight into a MinIO multipart upload, without spooling it to disk.
+    Size and type are checked inline and the content is hashed on the way.
+    """
+    def __init__(self, content_type: str, bucket_name: str, folder_path: str, file_id: str, max_size: int = None, part_size: int = None):
+        media_type, params = parse_options_header(content_type or "")
+        boundary = params.get(b"boundary")
+        if media_type != b"multipart/form-data" or not boundary:
+            raise HTTPException(status_code=400, detail="Expected a multipart/form-data body")
+
+        self.bucket_name = bucket_name
+        self.folder_path = folder_path
+        self.file_id = file_id
+        self.max_size = max_size or settings.MAX_FILE_SIZE
+        self.part_size = part_size or settings.STREAM_UPLOAD_PART_SIZE
+
+        self.file_name = None
+        self.file_key = None
+        self.extension = None
+        self.content_type = None
+        self.object_name = None
+        self.upload_id = None
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+        self.fields = {}
+        self.completed = False
+
+        self._parts = []
+        self._inflight = None
+        self._file_ended = False
+        self._buffer = bytearray()
+        self._events = []
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._current_field = None
+        self._in_file = False
+
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+        })
+
+    # --- callbackهای پارسر (همزمان)؛ رویدادها بعد از هر چانک پردازش می‌شوند ---
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        self._events.append(("headers", self._headers))
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        self._events.append(("data", data[start:end]))
+
+    def _on_part_end(self):
+        self._events.append(("end", None))
+
+    async def feed(self, chunk: bytes):
+        """
+        Parse one chunk of the request body and act on the parts it completes.
+        """
+        self._parser.write(chunk)
+        events, self._events = self._events, []
+        for kind, payload in events:
+            if kind == "headers":
+                await self._start_part(payload)
+            elif kind == "data":
+                await self._part_data(payload)
+            else:
+                await self._end_part()
+
+    async def _start_part(self, headers: dict):
+        _, options = parse_options_header(headers.get(b"content-disposition", b""))
+        file_name = options.get(b"filename")
+        if file_name is None:
+            self._in_file = False
+            self._current_field = options.get(b"name", b"").decode("utf-8", "replace")
+            self.fields[self._current_field] = b""
+            return
+
+        if self.file_name is not None:
+            raise HTTPException(status_code=400, detail="Only one file can be streamed per request")
+
+        self._in_file = True
+        self.file_name = file_name.decode("utf-8", "replace")
+        self.extension = self.file_name.rsplit('.', 1)[-1].lower() if '.' in self.file_name else ""
+        if self.extension not in allowed_extensions:
+            raise HTTPException(status_code=400, detail=f"File type '.{self.extension}' of file '{self.file_name}' is not allowed")
+
+        declared_type = headers.get(b"content-type", b"").decode("latin-1")
+        self.content_type = declared_type or guess_type(self.file_name)[0] or "application/octet-stream"
+        self.file_key = f"{self.file_id}.{self.extension}"
+        self.object_name = f"{self.folder_path}/{self.file_key}" if self.folder_path else self.file_key
+        self.upload_id = await run_storage_io(create_multipart_upload, self.bucket_name, self.object_name, self.content_type)
+
+    async def _part_data(self, data: bytes):
+        if not self._in_file:
+            value = self.fields[self._current_field] + data
+            if len(value) > MAX_FIELD_SIZE:
+                raise HTTPException(status_code=413, detail=f"Field '{self._current_field}' is too large")
+            self.fields[self._current_field] = value
+            return
+
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise HTTPException(
+                status_code=HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File '{self.file_name}' exceeds the maximum allowed size of {self.max_size // (1024 * 1024)} MB"
+            )
+        self.sha256.update(data)
+        self._buffer.extend(data)
+        while len(self._buffer) >= self.part_size:
+            await self._flush(self.part_size)
+
+    async def _end_part(self):
+        if not self._in_file:
+            self.fields[self._current_field] = self.fields[self._current_field].decode("utf-8", "replace")
+        else:
+            if self.size <= 0:
+                raise HTTPException(status_code=400, detail="Invalid file size")
+            if self._buffer:
+                await self._flush(len(self._buffer))
+            self._file_ended = True
+        self._in_file = False
+
+    async def _flush(self, length: int):
+        # یک بخش در حال آپلود می‌ماند و بخش بعدی همزمان بافر می‌شود
+        data = bytes(self._buffer[:length])
+        del self._buffer[:length]
+        await self._wait_inflight()
+        part_number = len(self._parts) + 1
+        self._inflight = (part_number, asyncio.ensure_future(
+            run_storage_io(upload_part_to_minio, self.bucket_name, self.object_name, self.upload_id, part_number, data)
+        ))
+
+    async def _wait_inflight(self):
+        if self._inflight is None:
+            return
+        part_number, task = self._inflight
+        self._inflight = None
+        self._parts.append((part_number, await task))
+
+    async def finish(self):
+        """
+        Complete the MinIO multipart upload once the whole body has been fed.
+        """
+        self._parser.finalize()
+        if self.file_name is None:
+            raise HTTPException(status_code=400, detail="No file found in the request body")
+        # finalize() پایان بدنه را بررسی نمی‌کند؛ بدنه بدون boundary پایانی ناقص است
+        if not self._file_ended:
+            raise HTTPException(status_code=400, detail="Request body ended before the file part was complete")
+        await self._wait_inflight()
+        result = await run_storage_io(complete_multipart_upload, self.bucket_name, self.object_name, self.upload_id, self._parts)
+        self.completed = True
+        return result
+
+    async def abort(self):
+        if self._inflight is not None:
+            _, task = self._inflight
+            self._inflight = None
+            await asyncio.gather(task, return_exceptions=True)
+        if self.upload_id and not self.completed:
+            try:
+                await run_storage_io(abort_multipart_upload, self.bucket_name, self.object_name, self.upload_id)
+            except Exception:
+                pass
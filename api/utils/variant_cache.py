@@ -0,0 +1,108 @@
+# api/utils/variant_cache.py
+import hashlib
+import os
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from configs import settings
+from .disk_lru import DiskLRU
+from .image_utils import pil_format
+from .image_transformer import image_transformer
+from .single_flight import SingleFlight
+
+class VariantCache(DiskLRU):
+    """
+    Local disk LRU of rendered image variants keyed by (file, version, width, height, format).
+    """
+    def __init__(self, root: str, max_bytes: int):
+        super().__init__(root, max_bytes, name="variant")
+
+    def _path(self, file_id, version: str, width: int, height: int, image_format: str) -> str:
+        # شناسه‌ی نسخه ممکن است کاراکترهای نامعتبر برای نام فایل داشته باشد
+        version_digest = hashlib.sha1(str(version).encode()).hexdigest()[:16]
+        return os.path.join(
+            self.root, str(file_id), f"{version_digest}_{width or 0}x{height or 0}.{image_format.lower()}"
+        )
+
+    def get(self, file_id, version: str, width: int, height: int, image_format: str) -> Optional[bytes]:
+        return self.read(self._path(file_id, version, width, height, image_format))
+
+    def contains(self, file_id, version: str, width: int, height: int, image_format: str) -> bool:
+        return self.lookup(self._path(file_id, version, width, height, image_format))
+
+    def put(self, file_id, version: str, width: int, height: int, image_format: str, data: bytes):
+        self.write(self._path(file_id, version, width, height, image_format), data)
+
+    def invalidate(self, file_id):
+        """
+        Drop every cached variant of a file.
+        """
+        self.remove_tree(os.path.join(self.root, str(file_id)))
+
+variant_cache = VariantCache(settings.VARIANT_CACHE_DIR, settings.VARIANT_CACHE_MAX_BYTES)
+variant_flight = SingleFlight("variant")
+
+async def _render_and_store(file_id, bucket_name, object_name, object_version, version_key, width, height, extension, image_format) -> bytes:
+    data = await image_transformer.transform_object(bucket_name, object_name, object_version, width, height, extension)
+    await run_in_threadpool(variant_cache.put, file_id, version_key, width, height, image_format, data)
+    return data
+
+async def render_variant(
+    file_id,
+    bucket_name: str,
+    object_name: str,
+    object_version: str,
+    version_key: str,
+    width: int = None,
+    height: int = None,
+    extension: str = None,
+) -> bytes:
+    """
+    Resized image variant from the cache; rendered from the object and cached on a miss.
+    Concurrent misses for the same variant share a single render.
+    """
+    image_format = pil_format(extension)
+    data = await run_in_threadpool(variant_cache.get, file_id, version_key, width, height, image_format)
+    if data is not None:
+        return data
+
+    return await variant_flight.do(
+        (str(file_id), version_key, width, height, image_format),
+        _render_and_store,
+        file_id, bucket_name, object_name, object_version, version_key, width, height, extension, image_format,
+    )
+
+async def _render_set_and_store(file_id, bucket_name, object_name, object_version, version_key, widths, extensions) -> list:
+    rendered = await image_transformer.transform_set_object(bucket_name, object_name, object_version, widths, extensions)
+    for width, extension, data in rendered:
+        await run_in_threadpool(variant_cache.put, file_id, version_key, width, None, pil_format(extension), data)
+    return rendered
+
+async def render_variant_set(
+    file_id,
+    bucket_name: str,
+    object_name: str,
+    object_version: str,
+    version_key: str,
+    widths: list,
+    extensions: list,
+) -> list:
+    """
+    Make sure every (width, extension) variant is cached, decoding the original once
+    for all the missing ones; returns the pairs that had to be rendered.
+    """
+    missing = []
+    for width in widths:
+        for extension in extensions:
+            if not await run_in_threadpool(variant_cache.contains, file_id, version_key, width, None, pil_format(extension)):
+                missing.append((width, extension))
+    if not missing:
+        return []
+
+    missing_widths = sorted({width for width, _ in missing})
+    missing_extensions = sorted({extension for _, extension in missing})
+    await variant_flight.do(
+        (str(file_id), version_key, tuple(missing_widths), tuple(missing_extensions)),
+        _render_set_and_store,
+        file_id, bucket_name, object_name, object_version, version_key, missing_widths, missing_extensions,
+    )
+    return missing